@@ -6,7 +6,7 @@ from . import engine, handlers, nodes, operators, properties, ui
 from .nodes import materials, volumes, textures
 from .ui import (
     aovs, blender_object, camera, config, display, errorlog,
-    halt, light, lightgroups, material, mesh, particle, postpro,
+    halt, light, lightgroups, material, mesh, particle, performance, postpro,
     render_layer, texture, world
 )
 
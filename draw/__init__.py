@@ -1,8 +1,12 @@
 from bgl import *  # Nah I'm not typing them all out
 import math
-import array
+import threading
+from time import time
 from ..bin import pyluxcore
 from .. import utils
+from . import precision as display_precision
+from . import tiles as display_tiles
+from . import passes as render_passes
 
 
 def draw_quad(offset_x, offset_y, width, height):
@@ -27,14 +31,30 @@ def draw_quad(offset_x, offset_y, width, height):
     glEnd()
 
 
+class _DisplayBuffers(object):
+    """ The film output of one frame and the converted data for the upload """
+    def __init__(self, length, converter_class, channels):
+        self.film = Buffer(GL_FLOAT, [length])
+
+        if converter_class:
+            # bgl has no 16 bit float or unsigned byte buffers, but only the size of the type matters
+            buffer_type = GL_SHORT if converter_class.bytes_per_value == 2 else GL_BYTE
+            self.upload = Buffer(buffer_type, [length])
+            self.converter = converter_class(self.film, self.upload, channels)
+        else:
+            self.upload = self.film
+            self.converter = None
+
+
 class FrameBuffer(object):
     """ FrameBuffer used for viewport render """
 
-    def __init__(self, context):
-        filmsize = utils.calc_filmsize(context.scene, context)
+    def __init__(self, context, scale=1):
+        filmsize = utils.calc_filmsize(context.scene, context, scale)
         self._width = filmsize[0]
         self._height = filmsize[1]
-        self._border = utils.calc_blender_border(context.scene, context)
+        # With a reduced film scale, the texture is stretched to the full size (see draw())
+        self.scale = scale
 
         if context.scene.camera:
             pipeline = context.scene.camera.data.luxcore.imagepipeline
@@ -51,28 +71,180 @@ class FrameBuffer(object):
             self._buffertype = GL_RGB
             self._output_type = pyluxcore.FilmOutputType.RGB_IMAGEPIPELINE
 
-        self.buffer = Buffer(GL_FLOAT, [self._width * self._height * bufferdepth])
+        buffer_length = self._width * self._height * bufferdepth
 
-        # Create texture
+        # The film is always fetched as float, but it can be converted to a smaller type for the upload
+        self.precision = context.scene.luxcore.display.viewport_precision
+        if display_precision.is_supported(self.precision):
+            converter_class = display_precision.CONVERTERS.get(self.precision)
+        else:
+            print("numpy not available, using full precision for the viewport")
+            converter_class = None
+
+        if converter_class:
+            self._upload_type = converter_class.gl_type
+            self._internal_format = converter_class.internal_format(bufferdepth)
+            bytes_per_value = converter_class.bytes_per_value
+        else:
+            self._upload_type = GL_FLOAT
+            self._internal_format = self._buffertype
+            bytes_per_value = 4
+
+        # fetch() fills the back buffers, upload() sends the front buffers to the GPU.
+        # They are swapped when a frame is complete, so fetch() can run in another thread.
+        self._front = _DisplayBuffers(buffer_length, converter_class, bufferdepth)
+        self._back = _DisplayBuffers(buffer_length, converter_class, bufferdepth)
+        self._swap_lock = threading.Lock()
+        self._has_new_frame = False
+        # The pass count of the last fetched frame, used to skip the fetch if there is no new frame
+        self._fetched_pass = None
+        # Only the tiles that changed since the last upload are uploaded, if numpy is available
+        if display_tiles.is_supported():
+            self._tile_comparer = display_tiles.TileComparer(self._width, self._height,
+                                                             bufferdepth, bytes_per_value)
+        else:
+            self._tile_comparer = None
+        self._dirty_tiles = None
+        # Set when the texture content is unknown (e.g. on startup or after a scene edit)
+        self._upload_all = True
+        # Duration of the last fetch and upload in seconds (shown in the PerformanceHUD)
+        self.fetch_time = 0
+        self.upload_time = 0
+
+        # Create texture. The storage is allocated only once, upload() only replaces the content
         self.texture = Buffer(GL_INT, 1)
         glGenTextures(1, self.texture)
         self.texture_id = self.texture[0]
 
-    def update(self, luxcore_session):
-        luxcore_session.GetFilm().GetOutputFloat(self._output_type, self.buffer)
-
-        # update texture
         glBindTexture(GL_TEXTURE_2D, self.texture_id)
-        if self._transparent:
-            mode = GL_RGBA
-        else:
-            mode = GL_RGB
-        glTexImage2D(GL_TEXTURE_2D, 0, mode, self._width, self._height, 0, mode,
-                     GL_FLOAT, self.buffer)
+        # Rows of 8 bit RGB or 16 bit RGB images are not necessarily aligned to 4 bytes
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glTexImage2D(GL_TEXTURE_2D, 0, self._internal_format, self._width, self._height, 0, self._buffertype,
+                     self._upload_type, self._front.upload)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+    def free(self):
+        """ Delete the OpenGL resources, needs an active OpenGL context (e.g. in view_update or view_draw) """
+        glDeleteTextures(1, self.texture)
+
+    def update(self, luxcore_session):
+        """
+        Copy the newest film output into the texture.
+        Returns False if the session did not render a new frame since the last upload.
+        """
+        self.fetch(luxcore_session)
+        return self.upload()
+
+    def fetch(self, luxcore_session):
+        """
+        Copy the newest film output into the back buffers and convert it for the upload.
+        Does not use OpenGL, so it can be called from a background thread (see engine.viewport.FrameFetcher).
+        Returns False if the session did not render a new frame since the last fetch.
+        """
+        rendered_pass = luxcore_session.GetStats().Get("stats.renderengine.pass").GetInt()
+        if rendered_pass == self._fetched_pass:
+            # Nothing new (e.g. the session is paused), the texture is still up to date
+            return False
+        self._fetched_pass = rendered_pass
+
+        start = time()
+        luxcore_session.GetFilm().GetOutputFloat(self._output_type, self._back.film)
+        if self._back.converter:
+            self._back.converter.convert()
+
+        if self._tile_comparer:
+            # The front buffers contain the last fetched frame
+            dirty_tiles = self._tile_comparer.find_dirty_tiles(self._front.upload, self._back.upload)
+        else:
+            dirty_tiles = None
+
+        with self._swap_lock:
+            self._front, self._back = self._back, self._front
+
+            if dirty_tiles is None:
+                self._upload_all = True
+            elif self._has_new_frame and self._dirty_tiles is not None:
+                # The last fetched frame was not uploaded, its changes are still missing in the texture
+                self._dirty_tiles |= dirty_tiles
+            else:
+                self._dirty_tiles = dirty_tiles
+
+            self._has_new_frame = True
+        self.fetch_time = time() - start
+        return True
+
+    def invalidate(self):
+        """
+        Make the next fetch() copy the film even if no new pass was rendered.
+        Needed after imagepipeline edits, they change the film output of a paused session.
+        """
+        with self._swap_lock:
+            self._fetched_pass = None
+
+    def reset(self):
+        """ Discard a fetched frame that was not uploaded yet, called after scene edits """
+        with self._swap_lock:
+            self._has_new_frame = False
+            # The pass count starts again at 0 after an edit
+            self._fetched_pass = None
+            self._upload_all = True
+
+    def upload(self):
+        """
+        Upload the last fetched frame to the texture.
+        Returns False if there was no new frame or nothing changed in it.
+        """
+        with self._swap_lock:
+            if not self._has_new_frame:
+                return False
+            self._has_new_frame = False
+
+            start = time()
+            if self._upload_all:
+                upload_all = True
+            else:
+                dirty_count = self._dirty_tiles.sum()
+                if dirty_count == 0:
+                    # The new frame looks exactly like the one in the texture
+                    return False
+                upload_all = dirty_count > self._dirty_tiles.size * display_tiles.MAX_DIRTY_FRACTION
+
+            glBindTexture(GL_TEXTURE_2D, self.texture_id)
+            glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+
+            if upload_all:
+                self._upload_full()
+            else:
+                self._upload_tiles()
+
+            glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+            glBindTexture(GL_TEXTURE_2D, 0)
+            self._upload_all = False
+            self.upload_time = time() - start
+        return True
+
+    def _upload_full(self):
+        glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, self._width, self._height, self._buffertype,
+                        self._upload_type, self._front.upload)
+
+    def _upload_tiles(self):
+        # The rectangles are read directly from the client buffer
+        glPixelStorei(GL_UNPACK_ROW_LENGTH, self._width)
+
+        for x, y, width, height in self._tile_comparer.dirty_rectangles(self._dirty_tiles):
+            glPixelStorei(GL_UNPACK_SKIP_PIXELS, x)
+            glPixelStorei(GL_UNPACK_SKIP_ROWS, y)
+            glTexSubImage2D(GL_TEXTURE_2D, 0, x, y, width, height, self._buffertype,
+                            self._upload_type, self._front.upload)
+
+        glPixelStorei(GL_UNPACK_ROW_LENGTH, 0)
+        glPixelStorei(GL_UNPACK_SKIP_PIXELS, 0)
+        glPixelStorei(GL_UNPACK_SKIP_ROWS, 0)
 
     def draw(self, region_size, view_camera_offset, view_camera_zoom, engine, context):
         if self._transparent:
@@ -80,6 +252,9 @@ class FrameBuffer(object):
 
         zoom = 0.25 * ((math.sqrt(2) + view_camera_zoom / 50) ** 2)
         offset_x, offset_y = self._calc_offset(context, region_size, view_camera_offset, zoom)
+        # The display size is computed on every draw instead of using the film size, so the image also
+        # fills the region while a film resize is pending (see engine.viewport) or the film scale is reduced
+        display_width, display_height = utils.calc_filmsize(context.scene, context)
 
         glEnable(GL_TEXTURE_2D)
         glEnable(GL_COLOR_MATERIAL)
@@ -89,7 +264,7 @@ class FrameBuffer(object):
             # This is the fragment shader that applies Blender color management
             engine.bind_display_space_shader(context.scene)
 
-        draw_quad(offset_x, offset_y, self._width, self._height)
+        draw_quad(offset_x, offset_y, display_width, display_height)
 
         if engine.support_display_space_shader(context.scene):
             engine.unbind_display_space_shader()
@@ -104,9 +279,12 @@ class FrameBuffer(object):
         if self._transparent:
             glDisable(GL_BLEND)
 
+        if engine.hud and context.scene.luxcore.display.show_hud:
+            engine.hud.draw(region_size)
+
     def _calc_offset(self, context, region_size, view_camera_offset, zoom):
         width_raw, height_raw = region_size
-        border_min_x, border_max_x, border_min_y, border_max_y = self._border
+        border_min_x, border_max_x, border_min_y, border_max_y = utils.calc_blender_border(context.scene, context)
 
         if context.region_data.view_perspective == "CAMERA" and context.scene.render.use_border:
             # Offset is only needed if viewport is in camera mode and uses border rendering
@@ -127,13 +305,15 @@ class FrameBuffer(object):
 
 class AOV:
     """ Storage class for info about an Arbitrary Output Variable """
-    def __init__(self, channel_count, array_type, convert_func, normalize):
+    def __init__(self, channel_count, array_type, convert_func, normalize, pad_value=0):
         self.channel_count = channel_count
-        # array_type is the type of the intermediate array.
+        # array_type is the type of the film output.
         # In the end, everything is converted to float for Blender.
         self.array_type = array_type
         self.convert_func = convert_func
         self.normalize = normalize
+        # Value of the channels the Blender pass has in addition to the film output
+        self.pad_value = pad_value
 
 
 # Note: RGB_IMAGEPIPELINE and RGBA_IMAGEPIPELINE are missing here because they
@@ -167,65 +347,116 @@ class FrameBufferFinal(object):
         self._transparent = pipeline.transparent_film
 
         if self._transparent:
-            bufferdepth = 4
             self._output_type = pyluxcore.FilmOutputType.RGBA_IMAGEPIPELINE
-            self._convert_combined = pyluxcore.ConvertFilmChannelOutput_4xFloat_To_4xFloatList
+            self._combined = AOV(4, "f", pyluxcore.ConvertFilmChannelOutput_4xFloat_To_4xFloatList, False)
         else:
-            bufferdepth = 3
             self._output_type = pyluxcore.FilmOutputType.RGB_IMAGEPIPELINE
-            self._convert_combined = pyluxcore.ConvertFilmChannelOutput_3xFloat_To_4xFloatList
-
-        self.combined_buffer = array.array("f", [0.0]) * (self._width * self._height * bufferdepth)
-        self.aov_buffers = {}
-
-    def draw(self, engine, session, scene):
+            # The Combined pass has an alpha channel, it is opaque
+            self._combined = AOV(3, "f", pyluxcore.ConvertFilmChannelOutput_3xFloat_To_4xFloatList, False, 1)
+
+        # Only used if a film output can't be written into the pass directly (see draw/passes.py).
+        # Shared by all passes, it grows to the size of the largest film output.
+        self._scratch_buffer = bytearray()
+        # The render result that is filled by the current refresh, see begin_refresh()
+        self._result = None
+        # Seconds the last finished refresh took, used to schedule the refreshes (see utils.render).
+        # None until the first refresh is finished.
+        self.last_refresh_cost = None
+        self._refresh_cost = 0
+        # Output name -> [total seconds, number of imports], to find out which passes make refreshes slow
+        self.refresh_times = {}
+
+    def draw(self, engine, session, scene, import_all_aovs=True):
+        """
+        If import_all_aovs is False, only the Combined pass and the AOVs pinned by the user are imported.
+        Blender merges every pass of the result, so the other AOVs are empty until the next full import.
+        """
+        jobs = self.begin_refresh(engine, scene, import_all_aovs)
+        self.import_outputs(session, jobs)
+        self.end_refresh(engine)
+
+    def begin_refresh(self, engine, scene, import_all_aovs):
+        """
+        Opens the render result and returns the list of outputs to import into it.
+        Has to be called from the main thread, like end_refresh(). Only import_outputs()
+        may run in another thread, it does not access the Blender API.
+        """
+        start = time()
         active_layer_index = scene.luxcore.active_layer_index
         scene_layer = scene.render.layers[active_layer_index]
+        aovs = scene_layer.luxcore.aovs
 
-        session.GetFilm().GetOutputFloat(self._output_type, self.combined_buffer)
-        result = engine.begin_result(0, 0, self._width, self._height, scene_layer.name)
+        self._result = engine.begin_result(0, 0, self._width, self._height, scene_layer.name)
         # Regardless of the scene render layers, the result always only contains one layer
-        render_layer = result.layers[0]
+        render_layer = self._result.layers[0]
 
         combined = render_layer.passes["Combined"]
-        self._convert_combined(self._width, self._height, self.combined_buffer, combined.as_pointer(), False)
+        jobs = [("COMBINED", self._output_type, self._combined, render_passes.PassTarget(combined))]
 
         for output_name, output_type in pyluxcore.FilmOutputType.names.items():
             # Check if AOV is enabled by user
-            if getattr(scene_layer.luxcore.aovs, output_name.lower(), False):
-                try:
-                    self._import_aov(output_name, output_type, render_layer, session)
-                except RuntimeError as error:
-                    print("Error on import of AOV %s: %s" % (output_name, error))
-
-        engine.end_result(result)
-
-    def _import_aov(self, output_name, output_type, render_layer, session):
-        if output_name in AOVS:
-            aov = AOVS[output_name]
-        else:
-            aov = DEFAULT_AOV_SETTINGS
-
+            if not getattr(aovs, output_name.lower(), False):
+                continue
+            if not import_all_aovs and output_name not in aovs.pinned:
+                continue
+
+            aov = AOVS.get(output_name, DEFAULT_AOV_SETTINGS)
+            # Depth needs special treatment because it's pre-defined by Blender and not uppercase
+            pass_name = "Depth" if output_name == "DEPTH" else output_name
+            target = render_passes.PassTarget(render_layer.passes[pass_name])
+            jobs.append((output_name, output_type, aov, target))
+
+        self._refresh_cost = time() - start
+        return jobs
+
+    def import_outputs(self, session, jobs, stop_event=None):
+        """ If the stop_event is set, the remaining outputs are skipped """
+        for output_name, output_type, aov, target in jobs:
+            if stop_event and stop_event.is_set():
+                return
+
+            start = time()
+            try:
+                self._import_output(output_type, aov, target, session)
+            except RuntimeError as error:
+                print("Error on import of AOV %s: %s" % (output_name, error))
+            seconds = time() - start
+            self._record_refresh_time(output_name, seconds)
+            self._refresh_cost += seconds
+
+    def end_refresh(self, engine):
+        start = time()
+        engine.end_result(self._result)
+        self._result = None
+        self.last_refresh_cost = self._refresh_cost + time() - start
+
+    def print_refresh_times(self):
+        print("Film refresh times (average per refresh):")
+        for output_name, (seconds, count) in sorted(self.refresh_times.items(), key=lambda item: -item[1][0]):
+            print("    %s: %.3fs (%d refreshes)" % (output_name, seconds / count, count))
+
+    def _record_refresh_time(self, output_name, seconds):
+        entry = self.refresh_times.setdefault(output_name, [0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    def _import_output(self, output_type, aov, target, session):
+        film = session.GetFilm()
         width = self._width
         height = self._height
 
-        try:
-            # Try to get the existing buffer for this AOV
-            buffer = self.aov_buffers[output_name]
-        except KeyError:
-            # Buffer for this AOV does not exist yet, create it
-            buffer = array.array(aov.array_type, [0]) * (width * height * aov.channel_count)
-            self.aov_buffers[output_name] = buffer
+        if render_passes.write_output(film, output_type, aov, target, width, height):
+            return
+
+        # Fallback: fill the scratch buffer and let LuxCore convert and copy it into the blender_pass.rect
+        size = width * height * aov.channel_count * 4
+        if len(self._scratch_buffer) < size:
+            self._scratch_buffer = bytearray(size)
+        buffer = memoryview(self._scratch_buffer)[:size]
 
-        # Fill the buffer
         if aov.array_type == "I":
-            session.GetFilm().GetOutputUInt(output_type, buffer)
+            film.GetOutputUInt(output_type, buffer)
         else:
-            session.GetFilm().GetOutputFloat(output_type, buffer)
-
-        # Depth needs special treatment because it's pre-defined by Blender and not uppercase
-        pass_name = "Depth" if output_name == "DEPTH" else output_name
-        blender_pass = render_layer.passes[pass_name]
+            film.GetOutputFloat(output_type, buffer)
 
-        # Convert and copy the buffer into the blender_pass.rect
-        aov.convert_func(width, height, buffer, blender_pass.as_pointer(), aov.normalize)
+        aov.convert_func(width, height, buffer, target.pointer, aov.normalize)
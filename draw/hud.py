@@ -0,0 +1,97 @@
+from bgl import *
+import blf
+from collections import deque
+
+# Number of values shown in the graphs
+HISTORY_LENGTH = 120
+
+GRAPH_WIDTH = 200
+GRAPH_HEIGHT = 28
+ROW_SPACING = 6
+TEXT_WIDTH = 190
+MARGIN = 10
+FONT_ID = 0
+FONT_SIZE = 11
+
+
+class Metric(object):
+    def __init__(self, label, unit, scale):
+        self.label = label
+        self.unit = unit
+        # Factor to convert the recorded value to the displayed unit
+        self.scale = scale
+        self.history = deque(maxlen=HISTORY_LENGTH)
+
+    def format(self):
+        if not self.history:
+            return "%s: -" % self.label
+        return "%s: %.2f %s" % (self.label, self.history[-1] * self.scale, self.unit)
+
+
+class PerformanceHUD(object):
+    """
+    Rolling history of viewport timings, fed by engine.viewport and drawn by FrameBuffer.draw().
+    Helps to find out if a slow viewport is caused by LuxCore or by the Python side of the addon.
+    Times are recorded in seconds.
+    """
+    def __init__(self):
+        self.metrics = {
+            "samples_per_sec": Metric("Samples/sec", "M", 1e-6),
+            "fetch": Metric("Film fetch", "ms", 1000),
+            "upload": Metric("Texture upload", "ms", 1000),
+            "get_changes": Metric("get_changes()", "ms", 1000),
+            "scene_edit": Metric("Scene edit", "ms", 1000),
+            "first_pixel": Metric("Edit to first pixel", "ms", 1000),
+        }
+
+    def record(self, name, value):
+        self.metrics[name].history.append(value)
+
+    def draw(self, region_size):
+        region_width, region_height = region_size
+        row_height = GRAPH_HEIGHT + ROW_SPACING
+        width = TEXT_WIDTH + GRAPH_WIDTH + 2 * MARGIN
+        height = len(self.metrics) * row_height + MARGIN
+        left = region_width - width - MARGIN
+        top = region_height - MARGIN
+
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+        # Background
+        glColor4f(0, 0, 0, 0.6)
+        glRectf(left, top - height, left + width, top)
+
+        blf.size(FONT_ID, FONT_SIZE, 72)
+
+        for i, metric in enumerate(self.metrics.values()):
+            row_bottom = top - (i + 1) * row_height
+            text_x = left + MARGIN
+            graph_x = text_x + TEXT_WIDTH
+
+            glColor4f(1, 1, 1, 1)
+            blf.position(FONT_ID, text_x, row_bottom + GRAPH_HEIGHT / 2 - FONT_SIZE / 2, 0)
+            blf.draw(FONT_ID, metric.format())
+
+            self._draw_graph(metric.history, graph_x, row_bottom)
+
+        glColor4f(1, 1, 1, 1)
+        glDisable(GL_BLEND)
+
+    def _draw_graph(self, history, x, y):
+        # Graph background
+        glColor4f(1, 1, 1, 0.1)
+        glRectf(x, y, x + GRAPH_WIDTH, y + GRAPH_HEIGHT)
+
+        if len(history) < 2:
+            return
+
+        # Each graph is scaled to its own maximum
+        maximum = max(history) or 1
+        step = GRAPH_WIDTH / (HISTORY_LENGTH - 1)
+
+        glColor4f(0.4, 0.8, 1, 1)
+        glBegin(GL_LINE_STRIP)
+        for i, value in enumerate(history):
+            glVertex2f(x + i * step, y + value / maximum * GRAPH_HEIGHT)
+        glEnd()
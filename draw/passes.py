@@ -0,0 +1,121 @@
+"""
+Writes LuxCore film outputs directly into the pixel memory of Blender render passes,
+without an intermediate buffer of the size of the film.
+"""
+
+import ctypes
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Number of rows that are padded at once, keeps the temporary copies small
+PAD_CHUNK_ROWS = 64
+# Number of values that are converted from uint to float at once
+CONVERT_CHUNK_SIZE = 1 << 20
+
+
+class _RenderPass(ctypes.Structure):
+    """ Start of the RenderPass struct of Blender 2.79 (render/extern/include/RE_pipeline.h) """
+    _fields_ = [
+        ("next", ctypes.c_void_p),
+        ("prev", ctypes.c_void_p),
+        ("channels", ctypes.c_int),
+        ("name", ctypes.c_char * 64),
+        ("chan_id", ctypes.c_char * 8),
+        ("rect", ctypes.c_void_p),
+        ("rectx", ctypes.c_int),
+        ("recty", ctypes.c_int),
+    ]
+
+
+class PassTarget(object):
+    """
+    The properties of a Blender render pass that are needed to write into it.
+    Collected in the main thread, so the film can be imported in another thread without accessing the Blender API.
+    """
+    def __init__(self, blender_pass):
+        self.pointer = blender_pass.as_pointer()
+        self.name = blender_pass.name
+        self.channels = blender_pass.channels
+
+
+def write_output(film, output_type, aov, target, width, height):
+    """
+    Fills the pass of the PassTarget with the film output, including the channel padding and normalization
+    the convert function of the AOV would do.
+    Returns False if this is not possible, the caller has to fall back to the convert function then.
+    """
+    address = _get_pass_memory(target, width, height)
+    if address is None:
+        return False
+
+    pass_channels = target.channels
+    needs_conversion = aov.array_type == "I" or aov.normalize or aov.channel_count != pass_channels
+    if needs_conversion and numpy is None:
+        return False
+
+    pixel_count = width * height
+    output_size = pixel_count * aov.channel_count
+
+    # The film output is written to the start of the pass memory, it has to be padded afterwards
+    if aov.array_type == "I":
+        film.GetOutputUInt(output_type, (ctypes.c_uint * output_size).from_address(address))
+    else:
+        film.GetOutputFloat(output_type, (ctypes.c_float * output_size).from_address(address))
+
+    if not needs_conversion:
+        return True
+
+    values = numpy.ctypeslib.as_array((ctypes.c_float * (pixel_count * pass_channels)).from_address(address))
+    output = values[:output_size]
+
+    if aov.array_type == "I":
+        _uint_to_float(output)
+    if aov.normalize:
+        _normalize(output)
+    if aov.channel_count != pass_channels:
+        _pad_channels(values, width, height, aov.channel_count, pass_channels, aov.pad_value)
+    return True
+
+
+def _get_pass_memory(target, width, height):
+    render_pass = _RenderPass.from_address(target.pointer)
+
+    # Guard against a different struct layout (e.g. in other Blender versions)
+    if (render_pass.name.decode("utf-8", "replace") != target.name
+            or render_pass.channels != target.channels
+            or render_pass.rectx != width or render_pass.recty != height
+            or not render_pass.rect):
+        return None
+    return render_pass.rect
+
+
+def _uint_to_float(values):
+    """ In-place conversion, the memory contains uints and is interpreted as float """
+    as_uint = values.view(numpy.uint32)
+    for start in range(0, len(values), CONVERT_CHUNK_SIZE):
+        end = start + CONVERT_CHUNK_SIZE
+        values[start:end] = as_uint[start:end].astype(numpy.float32)
+
+
+def _normalize(values):
+    maximum = values.max()
+    if maximum > 0:
+        values *= 1 / maximum
+
+
+def _pad_channels(values, width, height, channels, pass_channels, pad_value):
+    """
+    Spreads the tightly packed film output at the start of the memory to the pixel layout of the pass.
+    Works from the last row to the first, so unprocessed rows are never overwritten.
+    """
+    source = values[:width * height * channels].reshape(height, width, channels)
+    target = values.reshape(height, width, pass_channels)
+
+    for end in range(height, 0, -PAD_CHUNK_ROWS):
+        start = max(0, end - PAD_CHUNK_ROWS)
+        # The copy is needed because source and target rows of one chunk overlap
+        target[start:end, :, :channels] = source[start:end].copy()
+        target[start:end, :, channels:] = pad_value
@@ -0,0 +1,93 @@
+"""
+Conversion of the viewport film to reduced precision formats before the texture upload.
+Less bytes per pixel mean less data to copy and transfer to the GPU on every frame.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Not every bgl version exposes these constants, the values are from the OpenGL specification
+GL_HALF_FLOAT = 0x140B
+GL_UNSIGNED_BYTE = 0x1401
+GL_RGB16F = 0x881B
+GL_RGBA16F = 0x881A
+GL_SRGB8 = 0x8C41
+GL_SRGB8_ALPHA8 = 0x8C43
+
+# Resolution of the linear to sRGB lookup table, fine enough to not create banding in the darks
+SRGB_LUT_SIZE = 16384
+
+
+def is_supported(precision):
+    return precision == "FLOAT" or numpy is not None
+
+
+class HalfFloatConverter(object):
+    """ 32 bit float to 16 bit float, halves the size of the upload """
+    bytes_per_value = 2
+    gl_type = GL_HALF_FLOAT
+
+    def __init__(self, source, target, channels):
+        # Views on the memory of the bgl Buffers, no copies
+        self._source = numpy.frombuffer(source, dtype=numpy.float32)
+        self._target = numpy.frombuffer(target, dtype=numpy.float16)
+
+    @staticmethod
+    def internal_format(channels):
+        return GL_RGBA16F if channels == 4 else GL_RGB16F
+
+    def convert(self):
+        numpy.copyto(self._target, self._source, casting="same_kind")
+
+
+class SRGB8Converter(object):
+    """
+    32 bit float to 8 bit sRGB encoded, quarters the size of the upload.
+    The texture is stored in an sRGB format, so the GPU decodes it back to linear when sampling
+    and the display space shader of Blender still gets linear values. Values above 1 are clipped.
+    """
+    bytes_per_value = 1
+    gl_type = GL_UNSIGNED_BYTE
+    _lut = None
+
+    def __init__(self, source, target, channels):
+        self._source = numpy.frombuffer(source, dtype=numpy.float32)
+        self._target = numpy.frombuffer(target, dtype=numpy.uint8)
+        self._channels = channels
+        # Re-used between frames to avoid allocations
+        self._scaled = numpy.empty_like(self._source)
+        self._indices = numpy.empty(len(self._source), dtype=numpy.uint16)
+
+        if SRGB8Converter._lut is None:
+            SRGB8Converter._lut = _create_srgb_lut()
+
+    @staticmethod
+    def internal_format(channels):
+        return GL_SRGB8_ALPHA8 if channels == 4 else GL_SRGB8
+
+    def convert(self):
+        numpy.multiply(self._source, SRGB_LUT_SIZE - 1, out=self._scaled)
+        # Unlike clip(), fmax() and fmin() replace NaN (e.g. from a broken shader) with the limit
+        numpy.fmax(self._scaled, 0, out=self._scaled)
+        numpy.fmin(self._scaled, SRGB_LUT_SIZE - 1, out=self._scaled)
+        numpy.copyto(self._indices, self._scaled, casting="unsafe")
+        numpy.take(self._lut, self._indices, out=self._target, mode="clip")
+
+        if self._channels == 4:
+            # Alpha is not sRGB encoded
+            alpha = numpy.fmin(numpy.fmax(self._source[3::4], 0), 1) * 255 + 0.5
+            numpy.copyto(self._target[3::4], alpha, casting="unsafe")
+
+
+def _create_srgb_lut():
+    linear = numpy.linspace(0, 1, SRGB_LUT_SIZE)
+    srgb = numpy.where(linear <= 0.0031308, linear * 12.92, 1.055 * numpy.power(linear, 1 / 2.4) - 0.055)
+    return numpy.round(srgb * 255).astype(numpy.uint8)
+
+
+CONVERTERS = {
+    "HALF": HalfFloatConverter,
+    "BYTE": SRGB8Converter,
+}
@@ -0,0 +1,59 @@
+"""
+Change detection between two frames of the viewport film, so only the tiles that changed
+have to be uploaded to the texture (see FrameBuffer.upload()).
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TILE_SIZE = 64
+# If more tiles changed, one upload of the whole film is faster than many small ones
+MAX_DIRTY_FRACTION = 0.5
+
+_UINT_TYPES = {1: "uint8", 2: "uint16", 4: "uint32"}
+
+
+def is_supported():
+    return numpy is not None
+
+
+class TileComparer(object):
+    """ Compares the upload buffers of two frames tile by tile """
+    def __init__(self, width, height, channels, bytes_per_value):
+        self.width = width
+        self.height = height
+        self._row_length = width * channels
+        # The values are compared bitwise, this works for all types and is faster than a float comparison
+        self._dtype = numpy.dtype(_UINT_TYPES[bytes_per_value])
+        self._row_starts = numpy.arange(0, height, TILE_SIZE)
+        self._column_starts = numpy.arange(0, self._row_length, TILE_SIZE * channels)
+
+    def find_dirty_tiles(self, old_buffer, new_buffer):
+        """ Returns a 2D bool array with one entry per tile (rows from bottom to top) """
+        old = numpy.frombuffer(old_buffer, dtype=self._dtype).reshape(self.height, self._row_length)
+        new = numpy.frombuffer(new_buffer, dtype=self._dtype).reshape(self.height, self._row_length)
+        changed = old != new
+        changed_rows = numpy.logical_or.reduceat(changed, self._row_starts, axis=0)
+        return numpy.logical_or.reduceat(changed_rows, self._column_starts, axis=1)
+
+    def dirty_rectangles(self, dirty_tiles):
+        """ Yields (x, y, width, height) in pixels. Neighbouring dirty tiles in a row are merged """
+        for tile_y, row in enumerate(dirty_tiles):
+            y = tile_y * TILE_SIZE
+            height = min(TILE_SIZE, self.height - y)
+            tile_x = 0
+
+            while tile_x < len(row):
+                if not row[tile_x]:
+                    tile_x += 1
+                    continue
+
+                run_start = tile_x
+                while tile_x < len(row) and row[tile_x]:
+                    tile_x += 1
+
+                x = run_start * TILE_SIZE
+                width = min(tile_x * TILE_SIZE, self.width) - x
+                yield x, y, width, height
@@ -17,10 +17,29 @@ class LuxCoreRenderEngine(bpy.types.RenderEngine):
         self.session = None
         self.exporter = None
         self.error = None
+        # Exporters that are re-used for the next render layer/animation frame, see final.render()
+        self.kept_exporters = {}
+        self.animation_frame = None
+        # ChangeCounter.edit_revision at the end of the last final render, see final.render()
+        self.edit_revision = None
+        # Film scale of the viewport render, see viewport.AdaptiveResolution
+        self.adaptive_resolution = None
+        # Merges viewport scene edits, see viewport.EditCoalescer
+        self.edit_coalescer = None
+        # Viewport timings, see draw.hud.PerformanceHUD
+        self.hud = None
+        # Time of the last viewport region resize that was not applied to the film yet
+        self.film_resize_time = None
+        # Background thread that fetches new frames in viewport render, see viewport.FrameFetcher
+        self.frame_fetcher = None
+        # Background thread that imports the film in final render, see final.FilmRefreshWorker
+        self.film_refresh_worker = None
 
     def __del__(self):
         # Note: this method is also called when unregister() is called (for some reason I don't understand)
         print("LuxCoreRenderEngine del")
+        if getattr(self, "frame_fetcher", None):
+            self.frame_fetcher.stop()
         if hasattr(self, "_session") and self.session:
             print("del: stopping session")
             self.session.Stop()
@@ -44,8 +63,10 @@ class LuxCoreRenderEngine(bpy.types.RenderEngine):
             scene.luxcore.errorlog.add_error(error)
 
             # Clean up
+            final.stop_film_refresh_worker(self)
             del self.session
             self.session = None
+            self.kept_exporters = {}
         finally:
             scene.luxcore.active_layer_index = -1
 
@@ -70,6 +91,7 @@ class LuxCoreRenderEngine(bpy.types.RenderEngine):
         try:
             viewport.view_draw(self, context)
         except Exception as error:
+            viewport.stop_frame_fetcher(self)
             del self.session
             self.session = None
 
@@ -1,9 +1,100 @@
-from time import time, sleep
+import threading
+from time import time
 from .. import export, utils
 from ..draw import FrameBufferFinal
+from ..export.caches import ChangeCounter
 from ..utils import render as utils_render
 
 
+class FilmRefreshWorker(object):
+    """
+    Imports the film into the render result in a background thread, so the render loop keeps updating
+    the stats and checking halt conditions and cancellation while a large film is converted.
+    The render result is opened and handed to Blender in the main thread, because the Blender API is not
+    thread safe. The session must not be stopped while the worker runs, call stop() before.
+    """
+    def __init__(self, framebuffer, session):
+        self.framebuffer = framebuffer
+        self.session = session
+        # Set when the import is done, until finish() is called. Wakes up the render loop.
+        self.finished = threading.Event()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def is_busy(self):
+        return self._thread is not None
+
+    def start(self, engine, scene, import_all_aovs):
+        if self.is_busy():
+            # The last refresh is not finished yet
+            return
+
+        jobs = self.framebuffer.begin_refresh(engine, scene, import_all_aovs)
+        self._thread = threading.Thread(target=self._run, args=(jobs,), daemon=True)
+        self._thread.start()
+
+    def finish(self, engine):
+        """ Hands the imported film to Blender if the import is done """
+        if self._thread is None or not self.finished.is_set():
+            return
+
+        self._thread.join()
+        self._thread = None
+        self.finished.clear()
+        self.framebuffer.end_refresh(engine)
+
+    def stop(self, engine):
+        """ Skips the rest of a running import """
+        if self._thread is None:
+            return
+
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self._stop_event.clear()
+        self.finished.clear()
+        self.framebuffer.end_refresh(engine)
+
+    def _run(self, jobs):
+        try:
+            self.framebuffer.import_outputs(self.session, jobs, self._stop_event)
+        finally:
+            self.finished.set()
+
+
+class Deadlines(object):
+    """ Times at which the tasks of the render loop are due """
+    # Shortest time until a task is due, so the loop always sleeps between two runs of a task
+    MIN_DELAY = 0.01
+
+    def __init__(self):
+        self._times = {}
+
+    def set(self, task, deadline):
+        self._times[task] = max(deadline, time() + self.MIN_DELAY)
+
+    def get(self, task, default=None):
+        return self._times.get(task, default)
+
+    def remove(self, task):
+        self._times.pop(task, None)
+
+    def next(self):
+        return min(self._times.values())
+
+    def pop_due(self, now):
+        due = {task for task, deadline in self._times.items() if deadline <= now}
+        for task in due:
+            del self._times[task]
+        return due
+
+
+def stop_film_refresh_worker(engine):
+    if engine.film_refresh_worker:
+        engine.film_refresh_worker.stop(engine)
+        engine.film_refresh_worker = None
+
+
 def render(engine, scene):
     scene.luxcore.errorlog.clear()
 
@@ -15,6 +106,26 @@ def render(engine, scene):
 
     _check_halt_conditions(engine, scene)
 
+    if _use_persistent_export(engine, scene):
+        # A new animation render starts at frame_start, it must not use the scene of the last one.
+        # update_final() only looks for animated changes, edits since the last render need a new export.
+        is_next_frame = engine.animation_frame == scene.frame_current - scene.frame_step
+        if not is_next_frame or engine.edit_revision != ChangeCounter.edit_revision:
+            engine.kept_exporters = {}
+        engine.animation_frame = scene.frame_current
+    else:
+        engine.kept_exporters = {}
+
+    # Scene updates caused by the render itself are no edits
+    ChangeCounter.is_rendering = True
+    try:
+        _render_layers(engine, scene)
+    finally:
+        ChangeCounter.is_rendering = False
+        engine.edit_revision = ChangeCounter.edit_revision
+
+
+def _render_layers(engine, scene):
     for layer_index, layer in enumerate(scene.render.layers):
         print('Rendering layer "%s"' % layer.name)
 
@@ -35,18 +146,38 @@ def render(engine, scene):
 
         if engine.test_break():
             # Blender skips the rest of the render layers anyway
+            engine.kept_exporters = {}
             return
 
         print('Finished rendering layer "%s"' % layer.name)
+
+    if not _use_persistent_export(engine, scene):
+        # The exporters were only needed for the render layers of this frame
+        engine.kept_exporters = {}
     
 
 def _render_layer(engine, scene):
-    engine.exporter = export.Exporter()
-    engine.session = engine.exporter.create_session(scene, engine=engine)
+    share_layers = scene.luxcore.performance.use_shared_layer_export
+    # If the export is shared, all render layers use the same exporter
+    exporter_key = None if share_layers else scene.luxcore.active_layer_index
+    exporter = engine.kept_exporters.get(exporter_key)
+
+    if exporter:
+        # Only update what changed since the last frame/render layer
+        engine.exporter = exporter
+        engine.session = exporter.update_final(scene, engine)
+    else:
+        engine.exporter = export.Exporter()
+        engine.session = engine.exporter.create_session(scene, engine=engine)
+
+        if share_layers or _use_persistent_export(engine, scene):
+            engine.kept_exporters[exporter_key] = engine.exporter
 
     if engine.session is None:
         # session is None, but no error was thrown
         print("Export cancelled by user.")
+        # The luxcore scene might be half-updated
+        engine.kept_exporters = {}
         return
 
     engine.update_stats("Render", "Starting session...")
@@ -54,7 +185,6 @@ def _render_layer(engine, scene):
     engine.session.Start()
 
     config = engine.session.GetRenderConfig()
-    done = False
     start = time()
 
     if scene.luxcore.config.use_filesaver:
@@ -71,79 +201,135 @@ def _render_layer(engine, scene):
         engine.session = None
         return
 
+    if scene.luxcore.display.use_film_refresh_worker:
+        engine.film_refresh_worker = FilmRefreshWorker(engine.framebuffer, engine.session)
+
+    _render_loop(engine, scene, config, start)
+
+    # User wants to stop or halt condition is reached
+    # The final refresh is done synchronously, a running background refresh would be outdated anyway
+    stop_film_refresh_worker(engine)
+    # Update stats to refresh film and draw the final result, including all AOVs
+    utils_render.refresh(engine, scene, config, draw_film=True, import_all_aovs=True)
+    engine.framebuffer.print_refresh_times()
+    engine.update_stats("Render", "Stopping session...")
+    engine.session.Stop()
+    # Clean up
+    del engine.session
+    engine.session = None
+
+
+def _render_loop(engine, scene, config, start):
+    """
+    Runs the tasks of the render (stats, film refresh, clamp suggestion, halt checks) at their deadlines
+    and sleeps until the next deadline in between.
+    Blender does not notify about cancellation, so test_break() is the only task that is polled.
+    """
     # Fast refresh on startup so the user quickly sees an image forming.
     # Not used during animation render to enhance performance.
-    if not engine.is_animation:
-        FAST_REFRESH_DURATION = 5
-        refresh_interval = utils_render.shortest_display_interval(scene)
-        last_refresh = 0
-
-        while not done:
-            now = time()
-
-            if now - last_refresh > refresh_interval:
-                utils_render.refresh(engine, scene, config, draw_film=True)
-                done = engine.test_break() or engine.session.HasDone()
-
-            if now - start > FAST_REFRESH_DURATION:
-                # It's time to switch to the loop with slow refresh below
-                break
-
-            # This is a measure to make cancelling more responsive in this phase
-            checks = 10
-            for i in range(checks):
-                if engine.test_break():
-                    done = True
-                    break
-                sleep(1 / 60 / checks)
-
-    # Main loop where we refresh according to user-specified interval
-    last_film_refresh = time()
-    stat_refresh_interval = 1
-    last_stat_refresh = time()
-    computed_optimal_clamp = False
-
-    while not done:
+    FAST_REFRESH_DURATION = 0 if engine.is_animation else 5
+    # Share of the time that may be spent on refreshes in the fast refresh phase
+    FAST_REFRESH_OVERHEAD = 0.5
+    # We have to check the stats often to see if a halt condition is met
+    STATS_INTERVAL = 1
+    CANCEL_CHECK_INTERVAL = 0.1
+    CLAMP_SUGGESTION_DELAY = 10
+
+    deadlines = Deadlines()
+    deadlines.set("film", start)
+    deadlines.set("stats", start + STATS_INTERVAL)
+    deadlines.set("cancel", start + CANCEL_CHECK_INTERVAL)
+    deadlines.set("clamp", start + CLAMP_SUGGESTION_DELAY)
+
+    halt = utils.get_halt_conditions(scene)
+    if halt.enable and halt.use_time:
+        # Check right when the halt time is reached instead of waiting for the next stats update
+        deadlines.set("halt", start + halt.time)
+
+    worker = engine.film_refresh_worker
+    # Wakes the loop up early when a background film refresh is finished
+    wakeup = worker.finished if worker else threading.Event()
+    last_film_refresh = start
+    # Set when a film refresh was requested while the background refresh was still running
+    refresh_pending = False
+
+    def schedule_film_refresh(now):
+        if worker and worker.is_busy():
+            # The interval depends on the cost of the running refresh, it is scheduled when the worker is done
+            deadlines.remove("film")
+            return
+
+        if now - start < FAST_REFRESH_DURATION:
+            interval = utils_render.shortest_refresh_interval(scene, engine.framebuffer, FAST_REFRESH_OVERHEAD)
+        else:
+            interval = utils_render.film_refresh_interval(scene, engine.framebuffer, now - start)
+        deadlines.set("film", last_film_refresh + interval)
+
+    while True:
+        # Sleep until the next deadline or until the background film refresh is finished
+        if wakeup.wait(max(0, deadlines.next() - time())):
+            worker.finish(engine)
+            if refresh_pending:
+                refresh_pending = False
+                deadlines.set("film", time())
+            else:
+                schedule_film_refresh(time())
+
         now = time()
+        due = deadlines.pop_due(now)
 
-        if now - last_stat_refresh > stat_refresh_interval:
-            # We have to check the stats often to see if a halt condition is met
-            # But film drawing is expensive, so we don't do it every time we check stats
-            time_until_film_refresh = scene.luxcore.display.interval - (now - last_film_refresh)
-            draw_film = time_until_film_refresh <= 0
+        if "cancel" in due:
+            if engine.test_break():
+                return
+            deadlines.set("cancel", now + CANCEL_CHECK_INTERVAL)
+
+        if "clamp" in due:
+            # Compute and print the optimal clamp value. Done only once after a warmup phase.
+            # Only do this if clamping is disabled, otherwise the value is meaningless.
+            if not scene.luxcore.config.path.use_clamping:
+                optimal_clamp = utils_render.find_suggested_clamp_value(engine.session, scene)
+                print("Recommended clamp value:", optimal_clamp)
+
+        if due & {"stats", "film", "halt"}:
+            # Film drawing is expensive, so we don't do it every time we check stats
+            draw_film = "film" in due
 
             # Do session update (imagepipeline, lightgroups)
             changes = engine.exporter.get_changes(scene)
             engine.exporter.update_session(changes, engine.session)
             # Refresh quickly when user changed something
-            draw_film |= changes
+            draw_film |= bool(changes)
 
-            utils_render.refresh(engine, scene, config, draw_film, time_until_film_refresh)
-            done = engine.test_break() or engine.session.HasDone()
+            if draw_film and worker:
+                # Hand a finished background refresh to Blender, so the worker can start the next one
+                worker.finish(engine)
+                if worker.is_busy():
+                    # Refresh again as soon as the running refresh is finished
+                    refresh_pending = True
+                    draw_film = False
 
-            last_stat_refresh = now
             if draw_film:
                 last_film_refresh = now
+                deadlines.remove("film")
+                time_until_film_refresh = 0
+            else:
+                time_until_film_refresh = deadlines.get("film", now) - now
 
-        # Compute and print the optimal clamp value. Done only once after a warmup phase.
-        # Only do this if clamping is disabled, otherwise the value is meaningless.
-        path_settings = scene.luxcore.config.path
-        if not computed_optimal_clamp and not path_settings.use_clamping and time() - start > 10:
-            optimal_clamp = utils_render.find_suggested_clamp_value(engine.session, scene)
-            print("Recommended clamp value:", optimal_clamp)
-            computed_optimal_clamp = True
+            utils_render.refresh(engine, scene, config, draw_film, time_until_film_refresh)
+            # After the refresh, so the interval is based on its cost (unless it runs in the background)
+            schedule_film_refresh(now)
 
-        # Don't use up too much CPU time for this refresh loop, but stay responsive
-        sleep(1 / 60)
+            if engine.test_break() or engine.session.HasDone():
+                return
+            deadlines.set("stats", now + STATS_INTERVAL)
 
-    # User wants to stop or halt condition is reached
-    # Update stats to refresh film and draw the final result
-    utils_render.refresh(engine, scene, config, draw_film=True)
-    engine.update_stats("Render", "Stopping session...")
-    engine.session.Stop()
-    # Clean up
-    del engine.session
-    engine.session = None
+
+def _use_persistent_export(engine, scene):
+    """
+    Keep the exporters and their luxcore scenes between the frames of an animation.
+    The engine instance only survives between frames if persistent data is enabled.
+    """
+    return engine.is_animation and scene.render.use_persistent_data and not scene.luxcore.config.use_filesaver
 
 
 def _check_halt_conditions(engine, scene):
@@ -1,7 +1,197 @@
-from .. import export
+import math
+import threading
+from time import time
+from .. import export, utils
 from ..draw import FrameBuffer
+from ..draw.hud import PerformanceHUD
 from ..utils import render as utils_render
 
+# Seconds the region size has to stay the same before the film is resized
+FILM_RESIZE_DELAY = 0.25
+
+
+class AdaptiveResolution(object):
+    """
+    Renders the viewport film at reduced resolution while the user navigates or moves objects
+    and refines to full resolution when the interaction stops.
+    The scale is picked from the measured samples/sec so that one pass takes about 1/target_fps seconds.
+    """
+    # Coarse steps, because every change of the scale resizes the film
+    SCALES = (1, 0.75, 0.5, 0.35, 0.25)
+    # Seconds without interaction until the film is refined to full resolution
+    REFINE_DELAY = 0.3
+    INTERACTION = export.Change.CAMERA | export.Change.OBJECT
+
+    def __init__(self):
+        self.scale = 1
+        self._samples_per_sec = 0
+        self._last_interaction = 0
+        self._interaction_started = False
+
+    def register_changes(self, changes):
+        """ Has to see all changes, including the ones handled in view_update() """
+        if changes & self.INTERACTION:
+            now = time()
+            if now - self._last_interaction > self.REFINE_DELAY:
+                self._interaction_started = True
+            self._last_interaction = now
+
+    def update(self, context, stats):
+        """ Returns the film scale that should be used for the next redraws """
+        display = context.scene.luxcore.display
+        if not display.use_adaptive_resolution:
+            self.scale = 1
+            return self.scale
+
+        samples_per_sec = stats.Get("stats.renderengine.total.samplesec").GetFloat()
+        if samples_per_sec > 0:
+            # Not available while the session is paused, keep the last measurement
+            self._samples_per_sec = samples_per_sec
+
+        if self._interaction_started:
+            # The scale is kept until the interaction ends to avoid resizing the film all the time
+            self.scale = self._pick_scale(context, display.adaptive_target_fps)
+            self._interaction_started = False
+        elif time() - self._last_interaction > self.REFINE_DELAY:
+            self.scale = 1
+
+        return self.scale
+
+    def _pick_scale(self, context, target_fps):
+        if not self._samples_per_sec:
+            # Nothing measured yet
+            return 1
+
+        width, height = utils.calc_filmsize(context.scene, context)
+        # One pass renders one sample per pixel
+        full_pass_time = width * height / self._samples_per_sec
+        ideal_scale = math.sqrt(1 / target_fps / full_pass_time)
+
+        for scale in self.SCALES:
+            if scale <= ideal_scale:
+                return scale
+        return self.SCALES[-1]
+
+
+class FrameFetcher(object):
+    """
+    Copies new frames of the session into the back buffers of the framebuffer in a background thread,
+    so view_draw() only has to upload the most recent finished frame and never waits for the render.
+    The session must not be edited, replaced or paused while the fetcher runs, call stop() before.
+    """
+    # Seconds between checks for a new frame
+    POLL_INTERVAL = 1 / 60
+
+    def __init__(self, session, framebuffer):
+        self.session = session
+        self.framebuffer = framebuffer
+        # Copy of the session stats, updated by the thread
+        session.UpdateStats()
+        self.stats = session.GetStats()
+
+        # Set if the thread ended because of an error
+        self.failed = False
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.session.UpdateStats()
+                self.stats = self.session.GetStats()
+                self.framebuffer.fetch(self.session)
+            except Exception as error:
+                # The thread ends here, view_draw() fetches the frames itself then
+                print("Error in viewport frame fetcher:", error)
+                import traceback
+                traceback.print_exc()
+                self.failed = True
+                return
+
+            # The session does not notify about new frames, so we poll (the wait ends early on stop())
+            self._stop_event.wait(self.POLL_INTERVAL)
+
+
+class EditCoalescer(object):
+    """
+    Merges changes that arrive in quick succession (e.g. while a slider is dragged) into one scene
+    edit per window. Every scene edit restarts the rendering, so without merging LuxCore might never
+    get past the first pass. The first change after a quiet period is applied immediately.
+    The window adapts to the measured duration of the last scene edit and of a render pass.
+    """
+    MAX_WINDOW = 0.25
+
+    def __init__(self):
+        self.window = 0
+        # Number of scene edits that were avoided by merging
+        self.saved_edits = 0
+        self.has_pending = False
+        # Time of the first change of the last applied edit, until the first frame after it is drawn
+        self.waiting_since = None
+        self._first_change = 0
+        self._last_edit = 0
+        self._edit_duration = 0
+
+    def add(self, exporter, changes):
+        exporter.queue_changes(changes)
+        if exporter.pending_edit.changes and not self.has_pending:
+            self.has_pending = True
+            self._first_change = time()
+
+    def is_due(self):
+        return self.has_pending and time() - self._last_edit >= self.window
+
+    def apply(self, engine, context, changes=export.Change.NONE):
+        """ Applies the pending changes and the passed changes (which must not be added before) """
+        merged_count = engine.exporter.pending_edit.merged_count
+        applied_changes = changes | engine.exporter.pending_edit.changes
+
+        # The fetcher thread must not access the session during the update
+        stop_frame_fetcher(engine)
+        start = time()
+        # We have to re-assign the session because it might have been replaced due to filmsize change
+        engine.session = engine.exporter.update(context, engine.session, changes)
+        self._edit_duration = time() - start
+        self._last_edit = time()
+        engine.hud.record("scene_edit", self._edit_duration)
+
+        if engine.framebuffer:
+            # A frame that was fetched before the edit must not be shown as the result of the edit
+            engine.framebuffer.reset()
+            if applied_changes & export.Change.IMAGEPIPELINE:
+                # No new pass is rendered for an imagepipeline edit, but the film output changed
+                engine.framebuffer.invalidate()
+
+        self.waiting_since = self._first_change if self.has_pending else start
+        self.has_pending = False
+
+        if merged_count > 1:
+            self.saved_edits += merged_count - 1
+            print("Merged %d changes into one scene edit (%d edits saved in total)"
+                  % (merged_count, self.saved_edits))
+
+    def update_window(self, context, stats):
+        if not context.scene.luxcore.display.use_edit_coalescing:
+            self.window = 0
+            return
+
+        rendered_passes = stats.Get("stats.renderengine.pass").GetInt()
+        rendered_time = stats.Get("stats.renderengine.time").GetFloat()
+        pass_time = rendered_time / rendered_passes if rendered_passes else 0
+        # Give the render the time to finish at least one pass before the next edit restarts it
+        self.window = min(self.MAX_WINDOW, self._edit_duration + pass_time)
+
+
+def stop_frame_fetcher(engine):
+    if engine.frame_fetcher:
+        engine.frame_fetcher.stop()
+        engine.frame_fetcher = None
+
 
 def view_update(engine, context, changes=None):
     scene = context.scene
@@ -14,6 +204,9 @@ def view_update(engine, context, changes=None):
         try:
             engine.update_stats("Creating Render Session...", "")
             engine.exporter = export.Exporter()
+            engine.adaptive_resolution = AdaptiveResolution()
+            engine.edit_coalescer = EditCoalescer()
+            engine.hud = PerformanceHUD()
             # Note: in viewport render, the user can't cancel the
             # export (Blender limitation), so we don't pass engine here
             engine.session = engine.exporter.create_session(scene, context)
@@ -34,13 +227,28 @@ def view_update(engine, context, changes=None):
 
     if changes is None:
         changes = engine.exporter.get_changes(scene, context)
+        engine.adaptive_resolution.register_changes(changes)
 
-    if changes & export.Change.CONFIG:
+    if changes & export.Change.REQUIRES_CONFIG_UPDATE:
+        # The session is restarted anyway, apply everything right away
+        stop_frame_fetcher(engine)
         # Film resize requires a new framebuffer
-        engine.framebuffer = FrameBuffer(context)
+        if engine.framebuffer:
+            engine.framebuffer.free()
+        engine.framebuffer = FrameBuffer(context, engine.exporter.film_scale)
+        engine.edit_coalescer.apply(engine, context, changes)
+    else:
+        _schedule_edit(engine, context, changes)
+
+
+def _schedule_edit(engine, context, changes):
+    engine.edit_coalescer.add(engine.exporter, changes)
 
-    # We have to re-assign the session because it might have been replaced due to filmsize change
-    engine.session = engine.exporter.update(context, engine.session, changes)
+    if engine.edit_coalescer.is_due():
+        engine.edit_coalescer.apply(engine, context)
+    elif engine.edit_coalescer.has_pending:
+        # Make sure the pending changes are applied when the window is over
+        engine.tag_redraw()
     
 
 def view_draw(engine, context):
@@ -48,38 +256,88 @@ def view_draw(engine, context):
 
     # Check for changes because some actions in Blender (e.g. moving the viewport
     # camera) do not trigger a view_update() call, but only a view_draw() call.
+    start = time()
     changes = engine.exporter.get_changes(scene, context)
+    engine.hud.record("get_changes", time() - start)
+    engine.adaptive_resolution.register_changes(changes)
+
+    if changes & export.Change.FILM_SIZE:
+        # Dragging a splitter resizes the region on every redraw. LuxCore can not resize the film
+        # of a running session, so the resize is only applied when the size stays the same for a while.
+        # Until then, the old film is stretched over the region.
+        engine.film_resize_time = time()
+        changes &= ~export.Change.FILM_SIZE
+    elif engine.film_resize_time and time() - engine.film_resize_time > FILM_RESIZE_DELAY:
+        # The config cache already contains the latest film size
+        changes |= export.Change.FILM_SIZE
 
     if changes & export.Change.REQUIRES_VIEW_UPDATE:
+        engine.film_resize_time = None
         engine.tag_redraw()
         view_update(engine, context, changes)
         return
-    elif changes & export.Change.CAMERA:
-        # Only update in view_draw if it is a camera update,
-        # for everything else we call view_update().
-        # We have to re-assign the session because it might have been
-        # replaced due to filmsize change.
-        engine.session = engine.exporter.update(context, engine.session, export.Change.CAMERA)
+
+    # Some changes (e.g. camera updates) only trigger a view_draw() call. These and the changes
+    # that are still pending from the last view_update() calls are applied here.
+    _schedule_edit(engine, context, changes)
 
     # On startup we don't have a framebuffer yet
     if engine.framebuffer is None:
-        engine.framebuffer = FrameBuffer(context)
+        engine.framebuffer = FrameBuffer(context, engine.exporter.film_scale)
+    elif engine.framebuffer.precision != scene.luxcore.display.viewport_precision:
+        # The display precision is not part of the config, so the framebuffer is replaced here
+        stop_frame_fetcher(engine)
+        engine.framebuffer.free()
+        engine.framebuffer = FrameBuffer(context, engine.exporter.film_scale)
+
+    is_paused = engine.session.IsInPause()
+    use_frame_fetcher = scene.luxcore.display.use_frame_fetcher and not is_paused
+
+    if use_frame_fetcher and engine.frame_fetcher is None:
+        engine.frame_fetcher = FrameFetcher(engine.session, engine.framebuffer)
+
+    if use_frame_fetcher and not engine.frame_fetcher.failed:
+        # Only upload the newest frame the fetcher has finished, don't wait for the render
+        has_new_frame = engine.framebuffer.upload()
+    else:
+        # A paused session renders no new passes, but imagepipeline edits still change
+        # the film (see FrameBuffer.invalidate()), so it is fetched here when needed.
+        # A failed fetcher is kept until the next scene edit, so it is not restarted on every redraw.
+        if not use_frame_fetcher:
+            stop_frame_fetcher(engine)
+
+        if not is_paused:
+            try:
+                engine.session.UpdateStats()
+            except RuntimeError as error:
+                print("Error during UpdateStats():", error)
+            engine.session.WaitNewFrame()
+        # Skips the texture upload if the session has no new frame
+        has_new_frame = engine.framebuffer.update(engine.session)
+
+    if has_new_frame:
+        engine.hud.record("fetch", engine.framebuffer.fetch_time)
+        engine.hud.record("upload", engine.framebuffer.upload_time)
 
-    # Update and draw the framebuffer
-    try:
-        engine.session.UpdateStats()
-    except RuntimeError as error:
-        print("Error during UpdateStats():", error)
-    engine.session.WaitNewFrame()
-    engine.framebuffer.update(engine.session)
+        if engine.edit_coalescer.waiting_since:
+            engine.hud.record("first_pixel", time() - engine.edit_coalescer.waiting_since)
+            engine.edit_coalescer.waiting_since = None
 
     region_size = context.region.width, context.region.height
     view_camera_offset = list(context.region_data.view_camera_offset)
     view_camera_zoom = context.region_data.view_camera_zoom
     engine.framebuffer.draw(region_size, view_camera_offset, view_camera_zoom, engine, context)
 
+    if engine.frame_fetcher and not engine.frame_fetcher.failed:
+        stats = engine.frame_fetcher.stats
+    else:
+        stats = engine.session.GetStats()
+    # A changed scale leads to a config update (film resize) in the next view_draw()
+    engine.exporter.film_scale = engine.adaptive_resolution.update(context, stats)
+    engine.edit_coalescer.update_window(context, stats)
+    engine.hud.record("samples_per_sec", stats.Get("stats.renderengine.total.samplesec").GetFloat())
+
     # Check if we need to pause the viewport render
-    stats = engine.session.GetStats()
     rendered_time = stats.Get("stats.renderengine.time").GetFloat()
     halt_time = scene.luxcore.display.viewport_halt_time
     status_message = "%d/%ds" % (rendered_time, halt_time)
@@ -87,8 +345,13 @@ def view_draw(engine, context):
     if rendered_time > halt_time:
         if not engine.session.IsInPause():
             print("Pausing session")
+            stop_frame_fetcher(engine)
             engine.session.Pause()
         status_message += " (Paused)"
+
+        if engine.film_resize_time or engine.edit_coalescer.has_pending:
+            # Make sure the pending film resize or scene edit is applied
+            engine.tag_redraw()
     else:
         # Not in pause yet, keep drawing
         engine.tag_redraw()
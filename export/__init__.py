@@ -1,12 +1,20 @@
+import bpy
+import multiprocessing
 from time import time
 from ..bin import pyluxcore
 from .. import utils
+from ..utils import node as utils_node
 from . import (
     blender_object, caches, camera, config, duplis,
-    imagepipeline, light, material, motion_blur, hair, world
+    geometry_cache, imagepipeline, light, motion_blur, hair, profiler, world
 )
 from .light import WORLD_BACKGROUND_LIGHT_NAME
 
+# Below this number of light snapshots, starting worker processes takes longer than the conversion
+PARALLEL_SNAPSHOT_COUNT = 2000
+# Config keys that change when the viewport region is resized
+FILM_SIZE_KEYS = {"film.width", "film.height"}
+
 
 class Change:
     NONE = 0
@@ -18,9 +26,12 @@ class Change:
     VISIBILITY = 1 << 4
     WORLD = 1 << 5
     IMAGEPIPELINE = 1 << 6
+    # Config change that only affects the film size (e.g. viewport region resize)
+    FILM_SIZE = 1 << 7
 
     REQUIRES_SCENE_EDIT = CAMERA | OBJECT | MATERIAL | VISIBILITY | WORLD
-    REQUIRES_VIEW_UPDATE = CONFIG
+    REQUIRES_VIEW_UPDATE = CONFIG | FILM_SIZE
+    REQUIRES_CONFIG_UPDATE = CONFIG | FILM_SIZE
     REQUIRES_SESSION_PARSE = IMAGEPIPELINE
 
     @staticmethod
@@ -35,18 +46,68 @@ class Change:
         return s
 
 
+class PendingEdit(object):
+    """
+    Changes that were found by get_changes() but are not applied yet. Merging the changes of
+    several redraws allows to apply them with one scene edit (see engine.viewport.EditCoalescer).
+    Objects and materials are stored by name and looked up when the edit is applied,
+    because they might have been deleted in the meantime.
+    """
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.changes = Change.NONE
+        # Object names
+        self.transformed = set()
+        self.mesh_changed = set()
+        self.lamps = set()
+        # Material names
+        self.materials = set()
+        # Object keys (see utils.make_key())
+        self.objects_to_add = set()
+        self.objects_to_remove = set()
+        # How many get_changes() results were merged into this edit
+        self.merged_count = 0
+
+
 class Exporter(object):
     def __init__(self):
         print("exporter init")
-        self.config_cache = caches.StringCache()
+        self.config_cache = caches.DefinitionsCache()
         self.camera_cache = caches.CameraCache()
         self.object_cache = caches.ObjectCache()
         self.material_cache = caches.MaterialCache()
+        # Converted materials, shared by all objects, dupli objects and hair systems
+        self.material_export_cache = caches.MaterialExportCache()
         self.visibility_cache = caches.VisibilityCache()
         self.world_cache = caches.WorldCache()
-        self.imagepipeline_cache = caches.StringCache()
+        self.imagepipeline_cache = caches.DefinitionsCache()
+        # Tells get_changes() if config, camera and imagepipeline have to be converted at all
+        self.fingerprint_cache = caches.FingerprintCache()
+        # Viewport film resolution factor, set by engine.viewport.AdaptiveResolution
+        self.film_scale = 1
+        # On-disk mesh cache, only created in final render if enabled by the user
+        self.geometry_cache = None
+        # Maps utils.get_shared_mesh_key() to (luxcore_name, ExportedObject) of the first object using the mesh
+        self.shared_meshes = {}
+        # Names of the pointiness shapes that were defined for the shared meshes
+        self.pointiness_shapes = set()
+        # Timings of the export phases and objects, see export/profiler.py
+        self.profiler = profiler.ExportProfiler()
+        # Viewport changes that were not applied yet, see queue_changes()
+        self.pending_edit = PendingEdit()
+        # Kept so the luxcore scene can be re-used for the next frame of an animation render
+        self.renderconfig = None
+        # {object key: matrix_world} of the exported objects, used to find moved objects in update_final()
+        self.matrices = {}
+        # Frame and render layer of the last final render export, see update_final()
+        self.frame = None
+        self.layer_index = -1
         # This dict contains ExportedObject and ExportedLight instances
         self.exported_objects = {}
+        # {emitter key: (object names, light names)} of the duplis and hair, see track_emitted()
+        self.emitted = {}
 
     def create_session(self, scene, context=None, engine=None):
         # Notes:
@@ -55,23 +116,51 @@ class Exporter(object):
 
         print("create_session")
         start = time()
+        prof = self.profiler
+        prof.reset()
+
+        if context:
+            # Only the viewport needs the object updates collected by the scene update handler
+            self.object_cache.listen()
+            self.visibility_cache.listen()
+
+        performance = scene.luxcore.performance
+        if not context and performance.use_geometry_cache:
+            try:
+                max_size = performance.geometry_cache_size * 1024**2
+                self.geometry_cache = geometry_cache.GeometryCache(geometry_cache.get_cache_dir(scene), max_size)
+            except OSError as error:
+                msg = "Could not create geometry cache directory: %s" % error
+                scene.luxcore.errorlog.add_warning(msg)
         # Scene
         luxcore_scene = pyluxcore.Scene()
         scene_props = pyluxcore.Properties()
 
         # Camera (needs to be parsed first because it is needed for hair tesselation)
-        self.camera_cache.diff(scene, context)  # Init camera cache
-        luxcore_scene.Parse(self.camera_cache.props)
+        with prof.phase("camera"):
+            self.camera_cache.diff(scene, context)  # Init camera cache
+            luxcore_scene.Parse(self.camera_cache.props)
 
         # Objects and lamps
         objs = context.visible_objects if context else scene.objects
         len_objs = len(objs)
+        # Stage 1: walk the scene on the main thread. Lights are only read into plain
+        # Python definitions here, they are converted to properties in stage 2.
+        snapshots = []
 
         for index, obj in enumerate(objs, start=1):
             if obj.type in {"MESH", "CURVE", "SURFACE", "META", "FONT", "LAMP", "EMPTY"}:
                 if engine:
                     engine.update_stats("Export", "Object: %s (%d/%d)" % (obj.name, index, len_objs))
-                self._convert_object(scene_props, obj, scene, context, luxcore_scene, engine=engine)
+
+                with prof.object(obj.name):
+                    if self._can_snapshot(obj):
+                        self._snapshot_lamp(snapshots, obj, scene, context)
+                    else:
+                        self._convert_object(scene_props, obj, scene, context, luxcore_scene, engine=engine)
+
+                if not context:
+                    self.matrices[utils.make_key(obj)] = obj.matrix_world.copy()
 
                 # Objects are the most expensive to export, so they dictate the progress
                 if engine:
@@ -80,6 +169,20 @@ class Exporter(object):
             if engine and engine.test_break():
                 return None
 
+        cache = self.material_export_cache
+        print("Material cache: %d hits, %d misses" % (cache.hits, cache.misses))
+        if self.geometry_cache:
+            cache = self.geometry_cache
+            print("Geometry cache: %d hits, %d misses" % (cache.hits, cache.misses))
+        if self.shared_meshes:
+            print("Shared meshes: %d" % len(self.shared_meshes))
+
+        # Stage 2: convert the snapshots into properties, large scenes use worker processes
+        if engine:
+            engine.update_stats("Export", "Converting %d lights" % len(snapshots))
+        with prof.phase("lights"):
+            scene_props.Set(self._convert_snapshots(snapshots, scene))
+
         # Motion blur
         if scene.camera:
             blur_settings = scene.camera.data.luxcore.motion_blur
@@ -88,44 +191,52 @@ class Exporter(object):
             enabled = blur_settings.enable and (blur_settings.object_blur or camera_blur)
 
             if enabled and blur_settings.shutter > 0:
-                motion_blur_props, cam_moving = motion_blur.convert(context, scene, objs, self.exported_objects)
+                with prof.phase("motion_blur"):
+                    motion_blur_props, cam_moving = motion_blur.convert(context, scene, objs, self.exported_objects)
 
-                if cam_moving:
-                    # Re-export the camera with motion blur enabled
-                    # (This is fast and we only have to step through the scene once in total, not twice)
-                    camera_props = camera.convert(scene, context, cam_moving)
-                    motion_blur_props.Set(camera_props)
+                    if cam_moving:
+                        # Re-export the camera with motion blur enabled
+                        # (This is fast and we only have to step through the scene once in total, not twice)
+                        camera_props = camera.convert(scene, context, cam_moving)
+                        motion_blur_props.Set(camera_props)
 
-                scene_props.Set(motion_blur_props)
+                    scene_props.Set(motion_blur_props)
 
         # World
-        world_props = world.convert(scene)
-        scene_props.Set(world_props)
+        with prof.phase("world"):
+            world_props = world.convert(scene)
+            scene_props.Set(world_props)
 
-        luxcore_scene.Parse(scene_props)
+        with prof.phase("scene_parse"):
+            luxcore_scene.Parse(scene_props)
 
         # Regularly check if we should abort the export (important in heavy scenes)
         if engine and engine.test_break():
             return None
 
         # Convert config at last because all lightgroups and passes have to be already defined
-        config_props = config.convert(scene, context)
+        with prof.phase("config"):
+            config_definitions = config.convert_definitions(scene, context, self.film_scale)
 
-        if config_props is None:
+        if config_definitions is None:
             # There was a critical error in config export, we can't render
             raise Exception("Errors in config, check error log")
 
-        # Init config cache (convert to string here because config_props gets changed below)
-        self.config_cache.diff(str(config_props))
+        # Init config cache
+        self.config_cache.diff(config_definitions)
 
         # Imagepipeline
-        imagepipeline_props = imagepipeline.convert(scene, context)
-        self.imagepipeline_cache.diff(imagepipeline_props)  # Init imagepipeline cache
-        # Add imagepipeline to config props
-        config_props.Set(imagepipeline_props)
+        with prof.phase("imagepipeline"):
+            imagepipeline_definitions = imagepipeline.convert_definitions(scene, context)
+            self.imagepipeline_cache.diff(imagepipeline_definitions)  # Init imagepipeline cache
 
         # Create the renderconfig
-        renderconfig = pyluxcore.RenderConfig(config_props, luxcore_scene)
+        with prof.phase("RenderConfig"):
+            config_props = utils.create_props("", {**config_definitions, **imagepipeline_definitions})
+            renderconfig = pyluxcore.RenderConfig(config_props, luxcore_scene)
+        self.renderconfig = renderconfig
+        self.frame = (scene.frame_current, scene.frame_subframe)
+        self.layer_index = scene.luxcore.active_layer_index
 
         # Regularly check if we should abort the export (important in heavy scenes)
         if engine and engine.test_break():
@@ -144,23 +255,188 @@ class Exporter(object):
 
         # Create session (in case of OpenCL engines, render kernels are compiled here)
         start = time()
-        session = pyluxcore.RenderSession(renderconfig)
+        with prof.phase("RenderSession"):
+            session = pyluxcore.RenderSession(renderconfig)
         elapsed_msg = "Session created in %.1fs" % (time() - start)
         print(elapsed_msg)
 
+        prof.total = export_time + time() - start
+        if scene.luxcore.performance.use_export_profiler:
+            scene.luxcore.performance.store_profile(prof)
+
+        return session
+
+    def update_final(self, scene, engine=None):
+        """
+        Final render of the next animation frame and/or the next render layer: instead of exporting
+        everything again, update the luxcore scene of the last render (only moved/deformed/animated
+        objects are converted, render layer visibility and material override are applied) and
+        create a new session for it.
+        """
+        start = time()
+        prof = self.profiler
+        prof.reset()
+
+        frame = (scene.frame_current, scene.frame_subframe)
+        frame_changed = frame != self.frame
+        # Camera visibility and material override of all objects depend on the render layer
+        layer_changed = scene.luxcore.active_layer_index != self.layer_index
+        self.frame = frame
+        self.layer_index = scene.luxcore.active_layer_index
+
+        luxcore_scene = self.renderconfig.GetScene()
+        props = pyluxcore.Properties()
+
+        with prof.phase("camera"):
+            if self.camera_cache.diff(scene, None):
+                props.Set(self.camera_cache.props)
+
+        # Objects that were hidden in this frame
+        visible_keys = set()
+        for obj in scene.objects:
+            if utils.is_obj_visible(obj, scene, None):
+                visible_keys.add(utils.make_key(obj))
+
+        for key in list(self.exported_objects.keys()):
+            if key not in visible_keys:
+                self._delete_exported(key, luxcore_scene)
+
+        # The emitter itself is not always exported (e.g. if it is not rendered), but its duplis and hair are
+        for key in list(self.emitted.keys()):
+            if key not in visible_keys:
+                self._delete_emitted(key, luxcore_scene)
+
+        if frame_changed:
+            # Objects might now share their mesh with other objects than before
+            self.shared_meshes = {}
+            self.pointiness_shapes = set()
+        snapshots = []
+        objs = scene.objects
+        len_objs = len(objs)
+
+        for index, obj in enumerate(objs, start=1):
+            if obj.type not in {"MESH", "CURVE", "SURFACE", "META", "FONT", "LAMP", "EMPTY"}:
+                continue
+
+            key = utils.make_key(obj)
+
+            if self._can_snapshot(obj):
+                # Lights are cheap to convert, no need to check if they changed
+                self._snapshot_lamp(snapshots, obj, scene, None)
+                continue
+
+            is_deforming = (frame_changed and obj.data is not None and obj.type != "LAMP"
+                            and geometry_cache.is_deforming(obj))
+            # Particles and hair can change in every frame and their material depends on the render layer
+            has_particles = obj.is_duplicator or len(obj.particle_systems) > 0
+            moved = self.matrices.get(key) != obj.matrix_world
+            needs_update = is_deforming or has_particles or moved or layer_changed or obj.type == "LAMP"
+
+            if key not in self.exported_objects or needs_update:
+                if engine:
+                    engine.update_stats("Export", "Object: %s (%d/%d)" % (obj.name, index, len_objs))
+
+                with prof.object(obj.name):
+                    self._convert_object(props, obj, scene, None, luxcore_scene,
+                                         update_mesh=is_deforming, engine=engine)
+                self.matrices[key] = obj.matrix_world.copy()
+
+            if engine and engine.test_break():
+                return None
+
+        with prof.phase("lights"):
+            props.Set(self._convert_snapshots(snapshots, scene))
+
+        # Animated materials
+        if frame_changed:
+            with prof.phase("material"):
+                for mat in bpy.data.materials:
+                    node_tree = mat.luxcore.node_tree
+                    is_animated = mat.animation_data or (node_tree and utils_node.is_animated(node_tree))
+
+                    if is_animated and mat in self.material_export_cache:
+                        self.material_export_cache.invalidate(mat)
+                        self.material_export_cache.convert(mat, scene, None, luxcore_scene)
+
+        # Motion blur (the motion of the objects is different in each frame)
+        if scene.camera:
+            blur_settings = scene.camera.data.luxcore.motion_blur
+            enabled = blur_settings.enable and (blur_settings.object_blur or blur_settings.camera_blur)
+
+            if enabled and blur_settings.shutter > 0 and (frame_changed or layer_changed):
+                with prof.phase("motion_blur"):
+                    motion_blur_props, cam_moving = motion_blur.convert(None, scene, scene.objects,
+                                                                        self.exported_objects)
+                    if cam_moving:
+                        motion_blur_props.Set(camera.convert(scene, None, cam_moving))
+                    props.Set(motion_blur_props)
+
+        with prof.phase("world"):
+            props.Set(world.convert(scene))
+
+        with prof.phase("scene_parse"):
+            luxcore_scene.Parse(props)
+
+        # The config can be animated, too (e.g. the seed)
+        with prof.phase("config"):
+            config_definitions = config.convert_definitions(scene, None)
+
+        if config_definitions is None:
+            raise Exception("Errors in config, check error log")
+
+        with prof.phase("imagepipeline"):
+            imagepipeline_definitions = imagepipeline.convert_definitions(scene, None)
+
+        config_changed = self.config_cache.diff(config_definitions)
+        imagepipeline_changed = self.imagepipeline_cache.diff(imagepipeline_definitions)
+
+        if config_changed or imagepipeline_changed:
+            with prof.phase("RenderConfig"):
+                config_props = utils.create_props("", {**config_definitions, **imagepipeline_definitions})
+
+                if self.config_cache.removed_keys or self.imagepipeline_cache.removed_keys:
+                    # Parse() can only add or overwrite properties, removed ones (e.g. a halt condition,
+                    # a film output or the clamping settings) would still be used, so start from scratch
+                    print("Removed config keys:", ", ".join(sorted(self.config_cache.removed_keys
+                                                                   | self.imagepipeline_cache.removed_keys)))
+                    self.renderconfig = pyluxcore.RenderConfig(config_props, luxcore_scene)
+                else:
+                    self.renderconfig.Parse(config_props)
+
+        export_time = time() - start
+        print("Update took %.1fs" % export_time)
+
+        if engine:
+            engine.update_stats("Export Finished (%.1fs)" % export_time, "Creating RenderSession...")
+
+        start = time()
+        with prof.phase("RenderSession"):
+            session = pyluxcore.RenderSession(self.renderconfig)
+        print("Session created in %.1fs" % (time() - start))
+
+        prof.total = export_time + time() - start
+        if scene.luxcore.performance.use_export_profiler:
+            scene.luxcore.performance.store_profile(prof)
+
         return session
 
     def get_changes(self, scene, context=None):
         changes = Change.NONE
+        # Most redraws change nothing, in this case we can skip the expensive conversions below
+        settings_changed = self.fingerprint_cache.diff(scene, context, self.film_scale)
 
         if context:
             # Changes that only need to be checked in viewport render, not in final render
-            config_props = config.convert(scene, context)
-            if self.config_cache.diff(config_props):
-                changes |= Change.CONFIG
+            if settings_changed:
+                config_definitions = config.convert_definitions(scene, context, self.film_scale)
+                if config_definitions is not None and self.config_cache.diff(config_definitions):
+                    if self.config_cache.changed_keys <= FILM_SIZE_KEYS:
+                        changes |= Change.FILM_SIZE
+                    else:
+                        changes |= Change.CONFIG
 
-            if self.camera_cache.diff(scene, context):
-                changes |= Change.CAMERA
+                if self.camera_cache.diff(scene, context):
+                    changes |= Change.CAMERA
 
             if self.object_cache.diff(scene):
                 changes |= Change.OBJECT
@@ -175,16 +451,50 @@ class Exporter(object):
                 changes |= Change.WORLD
 
         # Relevant during final render
-        imagepipeline_props = imagepipeline.convert(scene, context)
-        if self.imagepipeline_cache.diff(imagepipeline_props):
-            changes |= Change.IMAGEPIPELINE
+        if settings_changed:
+            imagepipeline_definitions = imagepipeline.convert_definitions(scene, context)
+            if self.imagepipeline_cache.diff(imagepipeline_definitions):
+                changes |= Change.IMAGEPIPELINE
 
         return changes
 
+    def queue_changes(self, changes):
+        """
+        Remember the changes found by the last get_changes() call, they are applied by the next update().
+        Must be called only once per get_changes() result, config changes are not queued.
+        """
+        changes &= ~Change.REQUIRES_CONFIG_UPDATE
+        if not changes:
+            return
+
+        pending = self.pending_edit
+        pending.changes |= changes
+        pending.merged_count += 1
+
+        if changes & Change.OBJECT:
+            pending.transformed.update(obj.name for obj in self.object_cache.changed_transform)
+            pending.mesh_changed.update(obj.name for obj in self.object_cache.changed_mesh)
+            pending.lamps.update(obj.name for obj in self.object_cache.lamps)
+
+        if changes & Change.MATERIAL:
+            pending.materials.update(mat.name for mat in self.material_cache.changed_materials)
+
+        if changes & Change.VISIBILITY:
+            added = self.visibility_cache.objects_to_add
+            removed = self.visibility_cache.objects_to_remove
+            # Objects that were added and removed again in the meantime were never exported
+            newly_removed = removed - pending.objects_to_add
+            pending.objects_to_add = (pending.objects_to_add - removed) | added
+            pending.objects_to_remove = (pending.objects_to_remove - added) | newly_removed
+
     def update(self, context, session, changes):
+        """ Applies the changes and all queued changes (see queue_changes()) """
+        self.queue_changes(changes)
+        changes |= self.pending_edit.changes
         print("Update because of:", Change.to_string(changes))
 
-        if changes & Change.CONFIG:
+        if changes & Change.REQUIRES_CONFIG_UPDATE:
+            print("Changed config keys:", ", ".join(sorted(self.config_cache.changed_keys)))
             # We already converted the new config settings during get_changes(), re-use them
             session = self._update_config(session, self.config_cache.props)
 
@@ -218,6 +528,8 @@ class Exporter(object):
         if changes & Change.REQUIRES_SESSION_PARSE:
             self.update_session(changes, session)
 
+        self.pending_edit.clear()
+
         # We have to return and re-assign the session in the RenderEngine,
         # because it might have been replaced in _update_config()
         return session
@@ -231,6 +543,8 @@ class Exporter(object):
                         update_mesh=False, dupli_suffix="", engine=None):
         key = utils.make_key(obj)
         old_exported_obj = None
+        # The duplis and hair are converted again below, the number of them might be different now
+        self._delete_emitted(key, luxcore_scene)
 
         if key not in self.exported_objects:
             # We have to update the mesh because the object was not yet exported
@@ -242,11 +556,12 @@ class Exporter(object):
 
         # Note: exported_obj can also be an instance of ExportedLight, but they behave the same
         obj_props, exported_obj = blender_object.convert(obj, scene, context, luxcore_scene, old_exported_obj,
-                                                         update_mesh, dupli_suffix)
+                                                         update_mesh, dupli_suffix, exporter=self)
 
         # Convert particles and dupliverts/faces
         if obj.is_duplicator:
-            duplis.convert(obj, scene, context, luxcore_scene, engine)
+            with self.profiler.phase("duplis"):
+                duplis.convert(obj, scene, context, luxcore_scene, engine, exporter=self)
 
         # When moving a duplicated object, update the parent, too (concerns dupliverts/faces)
         if obj.parent and obj.parent.is_duplicator:
@@ -257,7 +572,8 @@ class Exporter(object):
             settings = psys.settings
             # render_type OBJECT and GROUP are handled by duplis.convert() above
             if settings.type == "HAIR" and settings.render_type == "PATH":
-                hair.convert_hair(obj, psys, luxcore_scene, scene, context, engine)
+                with self.profiler.phase("hair"):
+                    hair.convert_hair(obj, psys, luxcore_scene, scene, context, engine, exporter=self)
                 
         if exported_obj is None:
             # Object is not visible or an error happened.
@@ -268,6 +584,59 @@ class Exporter(object):
         self.exported_objects[key] = exported_obj
         return exported_obj
 
+    def _can_snapshot(self, obj):
+        # Meshlights define a mesh in the luxcore_scene, so they can't be deferred
+        return obj.type == "LAMP" and not obj.is_duplicator and not light.is_meshlight(obj.data)
+
+    def _snapshot_lamp(self, snapshots, obj, scene, context):
+        if not utils.is_obj_visible(obj, scene, context):
+            return
+
+        prefix, definitions, exported_light = light.snapshot_lamp(obj, scene, context)
+
+        if definitions is None:
+            # An error happened, it was already reported by light.snapshot_lamp()
+            return
+
+        snapshots.append((prefix, definitions))
+        self.exported_objects[utils.make_key(obj)] = exported_light
+
+    def track_emitted(self, emitter, object_names, light_names=()):
+        """
+        Called by the dupli and hair export. Their LuxCore objects and lights are not part of the
+        ExportedObject of the emitter, they have to be deleted with it (see _delete_emitted()).
+        """
+        objects, lights = self.emitted.setdefault(utils.make_key(emitter), ([], []))
+        objects += object_names
+        lights += light_names
+
+    def _convert_snapshots(self, snapshots, scene):
+        """
+        The snapshots only contain plain Python data, so the text for SetFromString() can be built
+        in worker processes. All of it crosses into pyluxcore with one SetFromString() call.
+        """
+        # scene.render.threads is either the number of cores or the fixed count set by the user
+        workers = min(scene.render.threads, len(snapshots) // PARALLEL_SNAPSHOT_COUNT)
+        # Spawned processes would have to import the addon and with it bpy, forked ones already contain it
+        results = None
+
+        if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+            chunk_size = -(-len(snapshots) // workers)
+            chunks = [snapshots[i:i + chunk_size] for i in range(0, len(snapshots), chunk_size)]
+
+            try:
+                with multiprocessing.get_context("fork").Pool(workers) as pool:
+                    results = pool.map(_snapshots_to_text, chunks)
+            except (OSError, multiprocessing.ProcessError) as error:
+                print("Could not convert the lights in worker processes (%s), converting them serially" % error)
+
+        if results is None:
+            results = [_snapshots_to_text(snapshots)]
+
+        text = "\n".join(chunk_text for chunk_text, _ in results if chunk_text)
+        unbatched = [pair for _, chunk_unbatched in results for pair in chunk_unbatched]
+        return utils.props_from_text(text, unbatched)
+
     def _update_config(self, session, config_props):
         renderconfig = session.GetRenderConfig()
         session.Stop()
@@ -288,52 +657,37 @@ class Exporter(object):
             # We already converted the new camera settings during get_changes(), re-use them
             props.Set(self.camera_cache.props)
 
+        pending = self.pending_edit
+        objects = context.scene.objects
+
         if changes & Change.OBJECT:
-            for obj in self.object_cache.changed_transform:
+            # A mesh update includes the transformation
+            for obj in self._lookup(objects, pending.transformed - pending.mesh_changed):
                 print("transformed:", obj.name)
                 self._convert_object(props, obj, context.scene, context, luxcore_scene, update_mesh=False)
 
-            for obj in self.object_cache.changed_mesh:
+            for obj in self._lookup(objects, pending.mesh_changed):
                 print("mesh changed:", obj.name)
                 self._convert_object(props, obj, context.scene, context, luxcore_scene, update_mesh=True)
 
-            for obj in self.object_cache.lamps:
+            for obj in self._lookup(objects, pending.lamps):
                 print("lamp changed:", obj.name)
                 self._convert_object(props, obj, context.scene, context, luxcore_scene)
 
         if changes & Change.MATERIAL:
-            for mat in self.material_cache.changed_materials:
-                luxcore_name, mat_props = material.convert(mat, context.scene, context)
-                props.Set(mat_props)
+            for mat in self._lookup(bpy.data.materials, pending.materials):
+                # The material cache parses the new definitions into luxcore_scene
+                self.material_export_cache.invalidate(mat)
+                self.material_export_cache.convert(mat, context.scene, context, luxcore_scene)
 
         if changes & Change.VISIBILITY:
-            for key in self.visibility_cache.objects_to_remove:
-                if key not in self.exported_objects:
-                    print('WARNING: Can not delete key "%s" from luxcore_scene' % key)
-                    print("The object was probably renamed")
-                    continue
-
-                exported_thing = self.exported_objects[key]
-
-                if exported_thing is None:
-                    print('Value for key "%s" is None!' % key)
-                    continue
-
-                # exported_objects contains instances of ExportedObject and ExportedLight
-                if isinstance(exported_thing, utils.ExportedObject):
-                    remove_func = luxcore_scene.DeleteObject
-                else:
-                    remove_func = luxcore_scene.DeleteLight
-
-                for luxcore_name in exported_thing.luxcore_names:
-                    print("Deleting", luxcore_name)
-                    remove_func(luxcore_name)
+            for key in pending.objects_to_remove:
+                self._delete_exported(key, luxcore_scene)
 
-                del self.exported_objects[key]
-
-            for key in self.visibility_cache.objects_to_add:
-                obj = utils.obj_from_key(key, context.visible_objects)
-                self._convert_object(props, obj, context.scene, context, luxcore_scene)
+            for key in pending.objects_to_add:
+                obj = self.visibility_cache.get_object(key)
+                if obj:
+                    self._convert_object(props, obj, context.scene, context, luxcore_scene)
 
         if changes & Change.WORLD:
             if context.scene.world.luxcore.light == "none":
@@ -343,3 +697,55 @@ class Exporter(object):
             props.Set(world_props)
 
         return props
+
+    def _lookup(self, collection, names):
+        """ Yields the datablocks of the names that still exist """
+        for name in names:
+            datablock = collection.get(name)
+            if datablock is not None:
+                yield datablock
+
+    def _delete_exported(self, key, luxcore_scene):
+        self._delete_emitted(key, luxcore_scene)
+
+        if key not in self.exported_objects:
+            print('WARNING: Can not delete key "%s" from luxcore_scene' % key)
+            print("The object was probably renamed")
+            return
+
+        exported_thing = self.exported_objects[key]
+
+        if exported_thing is None:
+            print('Value for key "%s" is None!' % key)
+            return
+
+        # exported_objects contains instances of ExportedObject and ExportedLight
+        if isinstance(exported_thing, utils.ExportedObject):
+            remove_func = luxcore_scene.DeleteObject
+        else:
+            remove_func = luxcore_scene.DeleteLight
+
+        for luxcore_name in exported_thing.luxcore_names:
+            print("Deleting", luxcore_name)
+            remove_func(luxcore_name)
+
+        del self.exported_objects[key]
+
+    def _delete_emitted(self, key, luxcore_scene):
+        if key not in self.emitted:
+            return
+
+        object_names, light_names = self.emitted.pop(key)
+
+        for luxcore_name in object_names:
+            luxcore_scene.DeleteObject(luxcore_name)
+        for luxcore_name in light_names:
+            luxcore_scene.DeleteLight(luxcore_name)
+
+
+def _snapshots_to_text(snapshots):
+    # Runs in a worker process, see Exporter._convert_snapshots()
+    batch = utils.PropsBatch()
+    for prefix, definitions in snapshots:
+        batch.add(prefix, definitions)
+    return utils.definitions_to_text(batch.definitions)
@@ -1,4 +1,3 @@
-from ..bin import pyluxcore
 from .. import utils
 from .imagepipeline import use_backgroundimage
 
@@ -11,9 +10,14 @@ LDR_CHANNELS = {
 
 # Exported in config export
 def convert(scene, context=None):
+    return utils.create_props("", convert_definitions(scene, context))
+
+
+def convert_definitions(scene, context=None):
+    """ Like convert(), but returns the definitions (with full keys) instead of pyluxcore.Properties """
     if scene.camera is None:
         # Can not work without a camera
-        return pyluxcore.Properties()
+        return {}
 
     try:
         prefix = "film.outputs."
@@ -93,13 +97,13 @@ def convert(scene, context=None):
             if aovs.convergence:
                 _add_output(definitions, "CONVERGENCE")
 
-        return utils.create_props(prefix, definitions)
+        return utils.add_prefix(prefix, definitions)
     except Exception as error:
         import traceback
         traceback.print_exc()
         msg = "AOVs: %s" % error
         scene.luxcore.errorlog.add_warning(msg)
-        return pyluxcore.Properties()
+        return {}
 
 
 def count_index(func):
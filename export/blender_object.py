@@ -4,11 +4,11 @@ from .. import utils
 from ..utils import ExportedObject
 from ..utils import node as utils_node
 
-from . import material
+from . import material, profiler
 from .light import convert_lamp
 
 def convert(blender_obj, scene, context, luxcore_scene,
-            exported_object=None, update_mesh=False, dupli_suffix=""):
+            exported_object=None, update_mesh=False, dupli_suffix="", exporter=None):
 
     if not utils.is_obj_visible(blender_obj, scene, context, is_dupli=dupli_suffix):
         return pyluxcore.Properties(), None
@@ -32,44 +32,84 @@ def convert(blender_obj, scene, context, luxcore_scene,
 
         transformation = utils.matrix_to_list(blender_obj.matrix_world, scene, apply_worldscale=True)
 
+        # Objects with the same mesh and modifier stack reuse the shapes of the first exported one (final render only)
+        if exporter and not context and not dupli_suffix:
+            shared_mesh_key = utils.get_shared_mesh_key(blender_obj)
+        else:
+            shared_mesh_key = None
+
         # Instancing just means that we transform the object instead of the mesh
-        if utils.use_instancing(blender_obj, scene, context) or dupli_suffix:
+        if utils.use_instancing(blender_obj, scene, context, shared_mesh_key) or dupli_suffix:
             obj_transform = transformation
             mesh_transform = None
         else:
             obj_transform = None
             mesh_transform = transformation
 
-        if update_mesh:
-            # print("converting mesh:", blender_obj.data.name)
-            modifier_mode = "PREVIEW" if context else "RENDER"
-            apply_modifiers = True
-            mesh = blender_obj.to_mesh(scene, apply_modifiers, modifier_mode)
-
-            if mesh is None or len(mesh.tessfaces) == 0:
-                # This is not worth a warning in the errorlog
-                print(blender_obj.name + ": No mesh data after to_mesh()")
-                return props, None
-
-            mesh_definitions = _convert_mesh_to_shapes(luxcore_name, mesh, luxcore_scene, mesh_transform)
-            bpy.data.meshes.remove(mesh, do_unlink=False)
+        shape_names = None
+        prof = exporter.profiler if exporter else profiler.NULL_PROFILER
+
+        if update_mesh and shared_mesh_key is not None and shared_mesh_key in exporter.shared_meshes:
+            src_name, src_exported_obj = exporter.shared_meshes[shared_mesh_key]
+            # Only the prefix of the object names is different, the suffix encodes the material index
+            mesh_definitions = [(luxcore_name + lux_object_name[len(src_name):], material_index)
+                                for lux_object_name, material_index in src_exported_obj.mesh_definitions]
+            shape_names = src_exported_obj.shape_names
+        elif update_mesh:
+            geometry_cache = exporter.geometry_cache if exporter and not context else None
+            cache_key = geometry_cache.make_key(blender_obj, scene) if geometry_cache else None
+
+            if cache_key:
+                with prof.phase("geometry_cache"):
+                    mesh_definitions = geometry_cache.define_mesh(cache_key, luxcore_name, luxcore_scene,
+                                                                  mesh_transform)
+            else:
+                mesh_definitions = None
+
+            if mesh_definitions is None:
+                # print("converting mesh:", blender_obj.data.name)
+                modifier_mode = "PREVIEW" if context else "RENDER"
+                apply_modifiers = True
+                with prof.phase("to_mesh"):
+                    mesh = blender_obj.to_mesh(scene, apply_modifiers, modifier_mode)
+
+                if mesh is None or len(mesh.tessfaces) == 0:
+                    # This is not worth a warning in the errorlog
+                    print(blender_obj.name + ": No mesh data after to_mesh()")
+                    return props, None
+
+                with prof.phase("DefineBlenderMesh"):
+                    mesh_definitions = _convert_mesh_to_shapes(luxcore_name, mesh, luxcore_scene, mesh_transform)
+                if cache_key:
+                    with prof.phase("geometry_cache"):
+                        geometry_cache.store(cache_key, mesh)
+                bpy.data.meshes.remove(mesh, do_unlink=False)
         else:
             assert exported_object is not None
             print(blender_obj.name + ": Using cached mesh")
             mesh_definitions = exported_object.mesh_definitions
+            shape_names = exported_object.shape_names
+
+        exported_obj = ExportedObject(mesh_definitions, shape_names)
+        if shared_mesh_key is not None and shared_mesh_key not in exporter.shared_meshes:
+            exporter.shared_meshes[shared_mesh_key] = (luxcore_name, exported_obj)
+
+        # Shared shapes are defined once, including the pointiness shapes derived from them
+        defined_pointiness = exporter.pointiness_shapes if shared_mesh_key is not None else None
 
         render_layer = utils.get_current_render_layer(scene)
         override_mat = render_layer.material_override if render_layer else None
+        # Object definitions are collected and converted to properties in one go at the end
+        batch = utils.PropsBatch()
 
-        for lux_object_name, material_index in mesh_definitions:
+        for (lux_object_name, material_index), luxcore_shape_name in zip(mesh_definitions, exported_obj.shape_names):
             if not context and override_mat:
                 # Only use override material in final render
-                lux_mat_name, mat_props = material.convert(override_mat, scene, context)
+                lux_mat_name = _convert_material(override_mat, scene, context, luxcore_scene, props, exporter)
             else:
                 if material_index < len(blender_obj.material_slots):
                     mat = blender_obj.material_slots[material_index].material
-                    # TODO material cache
-                    lux_mat_name, mat_props = material.convert(mat, scene, context)
+                    lux_mat_name = _convert_material(mat, scene, context, luxcore_scene, props, exporter)
 
                     if mat is None:
                         # Note: material.convert returned the fallback material in this case
@@ -80,12 +120,13 @@ def convert(blender_obj, scene, context, luxcore_scene,
                     msg = 'Object "%s": No material defined' % blender_obj.name
                     scene.luxcore.errorlog.add_warning(msg)
                     # Use fallback material
-                    lux_mat_name, mat_props = material.fallback()
+                    lux_mat_name = _convert_material(None, scene, context, luxcore_scene, props, exporter)
 
-            props.Set(mat_props)
-            _define_luxcore_object(props, lux_object_name, lux_mat_name, obj_transform, blender_obj, scene, context)
+            _define_luxcore_object(batch, lux_object_name, luxcore_shape_name, lux_mat_name, obj_transform,
+                                   blender_obj, scene, context, defined_pointiness)
 
-        return props, ExportedObject(mesh_definitions)
+        props.Set(batch.to_props())
+        return props, exported_obj
     except Exception as error:
         msg = 'Object "%s": %s' % (blender_obj.name, error)
         scene.luxcore.errorlog.add_warning(msg)
@@ -94,7 +135,26 @@ def convert(blender_obj, scene, context, luxcore_scene,
         return pyluxcore.Properties(), None
 
 
-def _handle_pointiness(props, luxcore_shape_name, blender_obj):
+def _convert_material(mat, scene, context, luxcore_scene, props, exporter=None):
+    """
+    Returns the luxcore name of the material.
+    If an exporter is passed, its material cache is used (each material is only converted once per export),
+    otherwise the material properties are added to props.
+    """
+    if exporter:
+        with exporter.profiler.phase("material"):
+            return exporter.material_export_cache.convert(mat, scene, context, luxcore_scene)
+
+    lux_mat_name, mat_props = material.convert(mat, scene, context)
+    props.Set(mat_props)
+    return lux_mat_name
+
+
+def _handle_pointiness(batch, luxcore_shape_name, blender_obj, defined_pointiness=None):
+    """
+    defined_pointiness: optional set of pointiness shape names that were already defined,
+    they are only referenced instead of being defined again
+    """
     use_pointiness = False
 
     for mat_slot in blender_obj.material_slots:
@@ -105,28 +165,31 @@ def _handle_pointiness(props, luxcore_shape_name, blender_obj):
 
     if use_pointiness:
         pointiness_shape = luxcore_shape_name + "_pointiness"
-        prefix = "scene.shapes." + pointiness_shape + "."
-        props.Set(pyluxcore.Property(prefix + "type", "pointiness"))
-        props.Set(pyluxcore.Property(prefix + "source", luxcore_shape_name))
+
+        if defined_pointiness is None or pointiness_shape not in defined_pointiness:
+            prefix = "scene.shapes." + pointiness_shape + "."
+            batch.set(prefix + "type", "pointiness")
+            batch.set(prefix + "source", luxcore_shape_name)
+            if defined_pointiness is not None:
+                defined_pointiness.add(pointiness_shape)
         luxcore_shape_name = pointiness_shape
 
     return luxcore_shape_name
 
 
-def _define_luxcore_object(props, lux_object_name, lux_material_name, obj_transform, blender_obj, scene, context):
-    # The "Mesh-" prefix is hardcoded in Scene_DefineBlenderMesh1 in the LuxCore API
-    luxcore_shape_name = "Mesh-" + lux_object_name
-    luxcore_shape_name = _handle_pointiness(props, luxcore_shape_name, blender_obj)
+def _define_luxcore_object(batch, lux_object_name, luxcore_shape_name, lux_material_name, obj_transform,
+                           blender_obj, scene, context, defined_pointiness=None):
+    luxcore_shape_name = _handle_pointiness(batch, luxcore_shape_name, blender_obj, defined_pointiness)
 
     prefix = "scene.objects." + lux_object_name + "."
-    props.Set(pyluxcore.Property(prefix + "material", lux_material_name))
+    batch.set(prefix + "material", lux_material_name)
 
-    props.Set(pyluxcore.Property(prefix + "shape", luxcore_shape_name))
+    batch.set(prefix + "shape", luxcore_shape_name)
     if obj_transform:
-        props.Set(pyluxcore.Property(prefix + "transformation", obj_transform))
+        batch.set(prefix + "transformation", obj_transform)
 
     visible_to_cam = utils.is_obj_visible_to_cam(blender_obj, scene, context)
-    props.Set(pyluxcore.Property(prefix + "camerainvisible", not visible_to_cam))
+    batch.set(prefix + "camerainvisible", not visible_to_cam)
 
 
 def _convert_mesh_to_shapes(name, mesh, luxcore_scene, mesh_transform):
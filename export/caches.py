@@ -1,7 +1,14 @@
 import bpy
+import weakref
+from itertools import compress
+from operator import ne, or_
 from .. import utils
 from ..utils import node as utils_node
-from ..export import smoke, camera
+from ..export import smoke, camera, material
+
+# Number of scene layers in Blender
+LAYER_COUNT = 20
+
 
 class StringCache(object):
     def __init__(self):
@@ -21,18 +28,149 @@ class StringCache(object):
         return has_changes
 
 
+# Marks keys that are missing in one of the compared definitions
+_MISSING = object()
+
+
+class DefinitionsCache(object):
+    """
+    Compares the definitions of an exporter (dict with full keys) before they are converted to
+    pyluxcore.Properties, so nothing has to be serialized. Also reports which keys changed.
+    """
+    def __init__(self):
+        self.definitions = None
+        # Keys that were added, removed or changed in the last diff()
+        self.changed_keys = set()
+        # Keys that were removed in the last diff()
+        self.removed_keys = set()
+
+    @property
+    def props(self):
+        return utils.create_props("", self.definitions)
+
+    def diff(self, definitions):
+        old_definitions = self.definitions
+        self.definitions = definitions
+
+        if old_definitions is None:
+            # Not initialized yet
+            self.changed_keys = set(definitions.keys())
+            self.removed_keys = set()
+            return True
+
+        if definitions == old_definitions:
+            # Fast path, the dict comparison happens in C
+            self.changed_keys = set()
+            self.removed_keys = set()
+            return False
+
+        all_keys = definitions.keys() | old_definitions.keys()
+        self.changed_keys = {key for key in all_keys
+                             if definitions.get(key, _MISSING) != old_definitions.get(key, _MISSING)}
+        self.removed_keys = old_definitions.keys() - definitions.keys()
+        return True
+
+
+class ChangeCounter(object):
+    """
+    Counts the scene updates that touched datablocks which influence config, camera or imagepipeline.
+    Fed by handlers.luxcore_scene_update_post(), used by the FingerprintCache.
+    This class is a singleton
+    """
+    revision = 0
+    # Counts the scene updates that touched any datablock, used to find edits between final renders.
+    # Frame changes (e.g. by an animation render) and updates during a final render are not counted.
+    edit_revision = 0
+    # Set by engine.final.render()
+    is_rendering = False
+    frame = None
+
+    @classmethod
+    def collect_updates(cls, scene):
+        data = bpy.data
+        # Note: changing an addon property (e.g. scene.luxcore.config) also marks its datablock as updated
+        if (data.scenes.is_updated or data.cameras.is_updated or data.objects.is_updated
+                or data.node_groups.is_updated or data.images.is_updated):
+            cls.revision += 1
+            is_edit = True
+        else:
+            is_edit = any(collection.is_updated for collection in cls._edited_collections())
+
+        frame = (scene.frame_current, scene.frame_subframe)
+        # Animated datablocks are updated when the frame changes
+        is_frame_change = frame != cls.frame
+        cls.frame = frame
+
+        if is_edit and not is_frame_change and not cls.is_rendering:
+            cls.edit_revision += 1
+
+    @staticmethod
+    def _edited_collections():
+        data = bpy.data
+        return (data.meshes, data.curves, data.metaballs, data.lattices, data.materials, data.textures,
+                data.lamps, data.worlds, data.groups, data.particles)
+
+
+class FingerprintCache(object):
+    """
+    Cheap check if config, camera or imagepipeline could have changed, so most redraws
+    can skip converting them. The fingerprint contains the ChangeCounter revision and the
+    viewport properties that change without a scene update (region size, view matrix etc.)
+    """
+    def __init__(self):
+        self.fingerprint = None
+
+    def diff(self, scene, context, film_scale=1):
+        fingerprint = self._fingerprint(scene, context, film_scale)
+        has_changes = fingerprint != self.fingerprint
+        self.fingerprint = fingerprint
+        return has_changes
+
+    def _fingerprint(self, scene, context, film_scale):
+        render = scene.render
+        fingerprint = [
+            ChangeCounter.revision, scene.frame_current, scene.frame_subframe,
+            render.resolution_x, render.resolution_y, render.resolution_percentage,
+            render.use_border, render.border_min_x, render.border_max_x, render.border_min_y, render.border_max_y,
+            render.threads_mode, render.threads,
+        ]
+
+        if context:
+            region_data = context.region_data
+            space = context.space_data
+            fingerprint += [
+                film_scale, context.region.width, context.region.height,
+                region_data.view_perspective, region_data.view_distance,
+                region_data.view_camera_zoom, tuple(region_data.view_camera_offset),
+                space.lens, space.clip_start, space.clip_end,
+                space.use_render_border, space.render_border_min_x, space.render_border_max_x,
+                space.render_border_min_y, space.render_border_max_y,
+            ]
+            fingerprint += [value for row in region_data.view_matrix for value in row]
+
+        return fingerprint
+
+
 class CameraCache(object):
     def __init__(self):
-        self.string_cache = StringCache()
+        self.definitions_cache = DefinitionsCache()
+        # The volume is exported by the node tree directly into pyluxcore.Properties
+        self.volume_cache = StringCache()
 
     @property
     def props(self):
-        return self.string_cache.props
+        props = self.definitions_cache.props
+        props.Set(self.volume_cache.props)
+        return props
+
+    @property
+    def changed_keys(self):
+        return self.definitions_cache.changed_keys
 
     def diff(self, scene, context):
-        # String cache
-        camera_props = camera.convert(scene, context)
-        has_changes = self.string_cache.diff(camera_props)
+        definitions = camera.convert_definitions(scene, context)
+        has_changes = self.definitions_cache.diff(definitions)
+        has_changes |= self.volume_cache.diff(camera.get_volume_props(scene))
 
         # Check camera object and data for changes
         # Needed in case the volume node tree was relinked/unlinked
@@ -43,38 +181,121 @@ class CameraCache(object):
 
 
 class ObjectCache(object):
+    """
+    Does not scan the whole scene in diff(). Instead, handlers.luxcore_scene_update_post() calls
+    collect_updates() after each scene update, which records the updated objects in all
+    listening ObjectCache instances (see listen(), one per running viewport render).
+    diff() only visits these objects.
+    """
+    _listeners = weakref.WeakSet()
+
     def __init__(self):
         self._reset()
+        # {object pointer: (object name, [is_updated, is_updated_data, data.is_updated])}
+        self._pending = {}
+
+    def listen(self):
+        """ Only needed for viewport render, final render does not call diff() """
+        ObjectCache._listeners.add(self)
 
     def _reset(self):
         self.changed_transform = []
         self.changed_mesh = []
         self.lamps = []
 
+    @classmethod
+    def collect_updates(cls, updated):
+        """ updated is the result of find_updated_objects() """
+        for cache in cls._listeners:
+            for pointer, (name, flags) in updated.items():
+                try:
+                    # The object was updated more than once since the last diff()
+                    old_flags = cache._pending[pointer][1]
+                    flags = [old or new for old, new in zip(old_flags, flags)]
+                except KeyError:
+                    pass
+                # The latest name is kept, the object might have been renamed in the meantime
+                cache._pending[pointer] = (name, flags)
+
     def diff(self, scene):
         self._reset()
-
-        if bpy.data.objects.is_updated:
-            for obj in scene.objects:
-                if obj.is_updated_data:
-                    if obj.type in ["MESH", "CURVE", "SURFACE", "META", "FONT"]:
+        pending = self._pending
+        self._pending = {}
+
+        for pointer, (name, (is_updated, is_updated_data, data_is_updated)) in pending.items():
+            obj = _find_object(scene, pointer, name)
+            if obj is None:
+                # Deleted, this is handled by the VisibilityCache
+                continue
+
+            if is_updated_data:
+                if obj.type in ["MESH", "CURVE", "SURFACE", "META", "FONT"]:
+                    self.changed_mesh.append(obj)
+                elif obj.type in ["LAMP"]:
+                    self.lamps.append(obj)
+
+            if is_updated:
+                if obj.type in ["MESH", "CURVE", "SURFACE", "META", "FONT", "EMPTY"]:
+                    # check if a new material was assigned
+                    if data_is_updated:
                         self.changed_mesh.append(obj)
-                    elif obj.type in ["LAMP"]:
-                        self.lamps.append(obj)
-
-                if obj.is_updated:
-                    if obj.type in ["MESH", "CURVE", "SURFACE", "META", "FONT", "EMPTY"]:
-                        # check if a new material was assigned
-                        if obj.data and obj.data.is_updated:
-                            self.changed_mesh.append(obj)
-                        else:
-                            self.changed_transform.append(obj)
-                    elif obj.type == "LAMP":
-                        self.lamps.append(obj)
+                    else:
+                        self.changed_transform.append(obj)
+                elif obj.type == "LAMP":
+                    self.lamps.append(obj)
 
         return self.changed_transform or self.changed_mesh or self.lamps
 
 
+def collect_object_updates(scene):
+    """
+    Called by handlers.luxcore_scene_update_post() after each scene update,
+    feeds the ObjectCache and VisibilityCache instances of running viewport renders.
+    """
+    if not bpy.data.objects.is_updated:
+        return
+    if not ObjectCache._listeners and not VisibilityCache._listeners:
+        return
+
+    updated = find_updated_objects(scene)
+    ObjectCache.collect_updates(updated)
+    VisibilityCache.collect_updates(scene, updated)
+
+
+def _find_object(scene, pointer, name):
+    obj = scene.objects.get(name)
+    if obj is not None and obj.as_pointer() == pointer:
+        return obj
+
+    # Renamed since the update, or a linked object with the same name. Rare, so the slow search is fine
+    for obj in scene.objects:
+        if obj.as_pointer() == pointer:
+            return obj
+    return None
+
+
+def find_updated_objects(scene):
+    """
+    Returns {object pointer: (object name, [is_updated, is_updated_data, data.is_updated])}
+    of all updated objects. Keyed by pointer because names are not unique (linked objects).
+    The update flags are only valid during a scene update (e.g. in a scene_update_post handler).
+    """
+    objects = scene.objects
+    count = len(objects)
+    # foreach_get() reads the flags of all objects in C, much faster than a Python loop
+    is_updated = [False] * count
+    is_updated_data = [False] * count
+    objects.foreach_get("is_updated", is_updated)
+    objects.foreach_get("is_updated_data", is_updated_data)
+
+    updated = {}
+    for index in compress(range(count), map(or_, is_updated, is_updated_data)):
+        obj = objects[index]
+        data_is_updated = bool(obj.data and obj.data.is_updated)
+        updated[obj.as_pointer()] = (obj.name, [is_updated[index], is_updated_data[index], data_is_updated])
+    return updated
+
+
 class MaterialCache(object):
     def __init__(self):
         self._reset()
@@ -109,6 +330,60 @@ class MaterialCache(object):
         return self.changed_materials
 
 
+class MaterialExportCache(object):
+    """
+    Converts each material only once per export, no matter how many objects, material slots,
+    dupli objects or hair systems use it.
+    The material definitions are parsed into the luxcore_scene right away,
+    so all later users only need to reference the luxcore name.
+    """
+    def __init__(self):
+        # {(material key, node tree key, revision): luxcore_name}
+        self.cache = {}
+        # {material key: revision}, incremented when a material is edited during viewport render
+        self.revisions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def convert(self, mat, scene, context, luxcore_scene):
+        key = self._make_key(mat)
+
+        try:
+            lux_mat_name = self.cache[key]
+            self.hits += 1
+        except KeyError:
+            self.misses += 1
+            # Note: if mat is None, material.convert returns the fallback material
+            lux_mat_name, mat_props = material.convert(mat, scene, context)
+            luxcore_scene.Parse(mat_props)
+            self.cache[key] = lux_mat_name
+
+        return lux_mat_name
+
+    def __contains__(self, mat):
+        return self._make_key(mat) in self.cache
+
+    def invalidate(self, mat):
+        """ Force a re-export of the material the next time it is used """
+        mat_key = utils.make_key(mat)
+        old_revision = self.revisions.get(mat_key, 0)
+        self.revisions[mat_key] = old_revision + 1
+        self.cache.pop((mat_key, self._node_tree_key(mat), old_revision), None)
+
+    def _make_key(self, mat):
+        if mat is None:
+            # All empty material slots share the fallback material
+            return None
+
+        mat_key = utils.make_key(mat)
+        # The node tree is part of the key so relinking a node tree leads to a re-export
+        return mat_key, self._node_tree_key(mat), self.revisions.get(mat_key, 0)
+
+    def _node_tree_key(self, mat):
+        node_tree = mat.luxcore.node_tree
+        return utils.make_key(node_tree) if node_tree else None
+
+
 class SmokeCache(object):
     """
     Only speeds up viewport updates that are not related to volume updates (e.g. when a material in the scene is edited,
@@ -132,27 +407,149 @@ class SmokeCache(object):
 
 
 class VisibilityCache(object):
+    """
+    Tracks the set of visible objects incrementally. Like the ObjectCache, it is fed by
+    collect_object_updates() after scene updates, so diff() does no work on redraws without changes.
+    Only objects whose hide flag or layers changed are checked again. The full set is only rebuilt
+    when objects are added or removed, when the visible layers of the viewport change or when
+    local view is used.
+    """
+    _listeners = weakref.WeakSet()
+
     def __init__(self):
         # sets containing keys
         self.last_visible_objects = None
         self.objects_to_remove = None
         self.objects_to_add = None
+        # {key: object} of all visible objects
+        self.visible_index = {}
+        self._view_layers = None
+        # Pointers of all scene objects and their flags at the last check, used to find the changes
+        self._pointers = set()
+        self._hide = None
+        self._layers = None
+        # {object pointer: object name} of the objects with changed flags since the last diff()
+        self._changed = {}
+        self._needs_rebuild = True
+
+    def listen(self):
+        """ Only needed for viewport render, final render does not call diff() """
+        VisibilityCache._listeners.add(self)
+
+    def get_object(self, key):
+        """ Returns the visible object with this key (see utils.make_key()) or None """
+        return self.visible_index.get(key)
+
+    @classmethod
+    def collect_updates(cls, scene, updated):
+        """ updated is the result of find_updated_objects() """
+        listeners = [cache for cache in cls._listeners if not cache._needs_rebuild]
+        if not listeners:
+            return
+
+        objects = scene.objects
+        hide, layers = _read_visibility_flags(objects)
+
+        for cache in listeners:
+            cache._collect(objects, updated, hide, layers)
+
+    def _collect(self, objects, updated, hide, layers):
+        # New objects are always tagged as updated. If the count doesn't match
+        # afterwards, objects were removed (or added without update tag)
+        has_new_objects = any(pointer not in self._pointers for pointer in updated)
+        if has_new_objects or len(hide) != len(self._pointers):
+            # The flags of the indices don't belong to the same objects anymore
+            self._needs_rebuild = True
+            return
+
+        # Indices of the objects with changed hide flag or layers
+        changed = set(compress(range(len(hide)), map(ne, hide, self._hide)))
+        for flat_index in compress(range(len(layers)), map(ne, layers, self._layers)):
+            changed.add(flat_index // LAYER_COUNT)
+
+        for index in changed:
+            obj = objects[index]
+            self._changed[obj.as_pointer()] = obj.name
+
+        self._hide = hide
+        self._layers = layers
 
     def diff(self, context):
-        visible_objs = self._get_visible_objects(context)
+        view_layers = self._get_view_layers(context)
+
         if self.last_visible_objects is None:
             # Not initialized yet
-            self.last_visible_objects = visible_objs
+            self._rebuild(context, view_layers)
             return False
 
-        self.objects_to_remove = self.last_visible_objects - visible_objs
-        self.objects_to_add = visible_objs - self.last_visible_objects
-        self.last_visible_objects = visible_objs
+        # In local view (view_layers is None), every visibility change needs a rebuild
+        if (self._needs_rebuild or view_layers != self._view_layers
+                or (view_layers is None and self._changed)):
+            old_visible_objects = self.last_visible_objects
+            self._rebuild(context, view_layers)
+            self.objects_to_remove = old_visible_objects - self.last_visible_objects
+            self.objects_to_add = self.last_visible_objects - old_visible_objects
+            return self.objects_to_remove or self.objects_to_add
+
+        return self._update(context.scene, view_layers)
+
+    def _rebuild(self, context, view_layers):
+        objects = context.scene.objects
+        self.visible_index = {utils.make_key(obj): obj for obj in context.visible_objects}
+        self.last_visible_objects = set(self.visible_index.keys())
+        self._view_layers = view_layers
+        self._pointers = {obj.as_pointer() for obj in objects}
+        self._hide, self._layers = _read_visibility_flags(objects)
+        self._changed = {}
+        self._needs_rebuild = False
+
+    def _update(self, scene, view_layers):
+        self.objects_to_remove = set()
+        self.objects_to_add = set()
+        changed = self._changed
+        self._changed = {}
+
+        for pointer, name in changed.items():
+            obj = _find_object(scene, pointer, name)
+            if obj is None:
+                continue
+
+            key = utils.make_key(obj)
+            visible = not obj.hide and any(ol and vl for ol, vl in zip(obj.layers, view_layers))
+
+            if visible and key not in self.last_visible_objects:
+                self.objects_to_add.add(key)
+                self.last_visible_objects.add(key)
+                self.visible_index[key] = obj
+            elif not visible and key in self.last_visible_objects:
+                self.objects_to_remove.add(key)
+                self.last_visible_objects.remove(key)
+                del self.visible_index[key]
+
         return self.objects_to_remove or self.objects_to_add
 
-    def _get_visible_objects(self, context):
-        as_keylist = [utils.make_key(obj) for obj in context.visible_objects]
-        return set(as_keylist)
+    def _get_view_layers(self, context):
+        """ Returns None if the visibility can't be tracked incrementally """
+        space = context.space_data
+
+        if space and space.type == "VIEW_3D":
+            if space.local_view:
+                # Local view uses special layers that are not accessible from Python
+                return None
+            # Equal to the scene layers, unless the viewport layers are unlocked
+            return tuple(space.layers)
+
+        return tuple(context.scene.layers)
+
+
+def _read_visibility_flags(objects):
+    """ Returns the hide flags and the flattened layers (LAYER_COUNT entries per object) of all objects """
+    count = len(objects)
+    hide = [False] * count
+    layers = [False] * (count * LAYER_COUNT)
+    objects.foreach_get("hide", hide)
+    objects.foreach_get("layers", layers)
+    return hide, layers
 
 
 class WorldCache(object):
@@ -6,6 +6,16 @@ from ..nodes.output import get_active_output
 
 
 def convert(scene, context=None, is_camera_moving=False):
+    cam_props = utils.create_props("", convert_definitions(scene, context, is_camera_moving))
+    cam_props.Set(get_volume_props(scene))
+    return cam_props
+
+
+def convert_definitions(scene, context=None, is_camera_moving=False):
+    """
+    Like convert(), but returns the definitions (with full keys) instead of pyluxcore.Properties.
+    The camera volume is not included, see get_volume_props().
+    """
     try:
         prefix = "scene.camera."
         definitions = {}
@@ -31,15 +41,13 @@ def convert(scene, context=None, is_camera_moving=False):
         _clipping_plane(scene, definitions)
         _motion_blur(scene, definitions, context, is_camera_moving)
 
-        cam_props = utils.create_props(prefix, definitions)
-        cam_props.Set(_get_volume_props(scene))
-        return cam_props
+        return utils.add_prefix(prefix, definitions)
     except Exception as error:
         import traceback
         traceback.print_exc()
         msg = 'Camera: %s' % error
         scene.luxcore.errorlog.add_warning(msg)
-        return pyluxcore.Properties()
+        return {}
 
 
 def _view_ortho(scene, context, definitions):
@@ -255,7 +263,7 @@ def _calc_lookat(cam_matrix, scene):
     return lookat_orig, lookat_target, up_vector
 
 
-def _get_volume_props(scene):
+def get_volume_props(scene):
     props = pyluxcore.Properties()
 
     if scene.camera is None:
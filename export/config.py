@@ -1,24 +1,36 @@
 import os
 import errno
 import bpy
-from ..bin import pyluxcore
 from .. import utils
 from . import aovs
 from .imagepipeline import use_backgroundimage
 
 
-def convert(scene, context=None):
+def convert(scene, context=None, film_scale=1):
+    definitions = convert_definitions(scene, context, film_scale)
+
+    if definitions is None:
+        return None
+    return utils.create_props("", definitions)
+
+
+def convert_definitions(scene, context=None, film_scale=1):
+    """
+    Like convert(), but returns the definitions (with full keys, including the AOVs)
+    instead of pyluxcore.Properties. Returns None if the config could not be converted.
+    film_scale reduces the viewport film resolution.
+    """
     try:
         prefix = ""
         # We collect the properties in this dictionary.
         # Common props are set at the end of the function.
         # Very specific props that are not needed every time are set in the if/else.
-        # The dictionary is converted to pyluxcore.Properties() in the return statement.
+        # The dictionary is converted to pyluxcore.Properties() in convert().
         definitions = {}
 
         # See properties/config.py
         config = scene.luxcore.config
-        width, height = utils.calc_filmsize(scene, context)
+        width, height = utils.calc_filmsize(scene, context, film_scale)
 
         if context:
             # TODO: Support OpenCL in viewport?
@@ -125,14 +137,12 @@ def convert(scene, context=None):
 
         _convert_seed(scene, definitions)
 
-        # Create the properties
-        config_props = utils.create_props(prefix, definitions)
+        definitions = utils.add_prefix(prefix, definitions)
 
         # Convert AOVs
-        aov_props = aovs.convert(scene, context)
-        config_props.Set(aov_props)
+        definitions.update(aovs.convert_definitions(scene, context))
 
-        return config_props
+        return definitions
     except Exception as error:
         msg = 'Config: %s' % error
         # Note: Exceptions in the config are critical, we can't render without a config
@@ -16,7 +16,7 @@ class Duplis:
         self.count += 1
 
 
-def convert(blender_obj, scene, context, luxcore_scene, engine=None):
+def convert(blender_obj, scene, context, luxcore_scene, engine=None, exporter=None):
     """
     Converts particle systems and dupliverts/faces (everything apart from hair)
     """
@@ -36,6 +36,8 @@ def convert(blender_obj, scene, context, luxcore_scene, engine=None):
 
         name_prefix = utils.get_luxcore_name(blender_obj, context)
         exported_duplis = {}
+        # Names of the LuxCore lights created for the duplis
+        light_names = []
         non_invertible_count = 0
 
         dupli_count = len(blender_obj.dupli_list)
@@ -57,12 +59,14 @@ def convert(blender_obj, scene, context, luxcore_scene, engine=None):
                 # It is a light
                 name_suffix = _get_name_suffix(name_prefix, dupli, context)
                 light_props, exported_light = blender_object.convert(dupli.object, scene, context, luxcore_scene,
-                                                                     update_mesh=True, dupli_suffix=name_suffix)
+                                                                     update_mesh=True, dupli_suffix=name_suffix,
+                                                                     exporter=exporter)
                 for luxcore_name in exported_light.luxcore_names:
                     key = "scene.lights." + luxcore_name + ".transformation"
                     light_props.Set(pyluxcore.Property(key, matrix_list))
 
                 dupli_props.Set(light_props)
+                light_names += exported_light.luxcore_names
             else:
                 # It is an object or area light
                 try:
@@ -72,7 +76,8 @@ def convert(blender_obj, scene, context, luxcore_scene, engine=None):
                     # Not yet exported
                     name_suffix = _get_name_suffix(name_prefix, dupli, context)
                     obj_props, exported_obj = blender_object.convert(dupli.object, scene, context, luxcore_scene,
-                                                                     update_mesh=True, dupli_suffix=name_suffix)
+                                                                     update_mesh=True, dupli_suffix=name_suffix,
+                                                                     exporter=exporter)
                     dupli_props.Set(obj_props)
                     exported_duplis[name] = Duplis(exported_obj, matrix_list)
 
@@ -96,6 +101,8 @@ def convert(blender_obj, scene, context, luxcore_scene, engine=None):
         blender_obj.dupli_list_clear()
         # Need to parse so we have the dupli objects available for DuplicateObject
         luxcore_scene.Parse(dupli_props)
+        # Names of the LuxCore objects created by DuplicateObject()
+        object_names = []
 
         for duplis in exported_duplis.values():
             # exported_obj sometimes is None, e.g. when instancing a group using an empty
@@ -111,6 +118,8 @@ def convert(blender_obj, scene, context, luxcore_scene, engine=None):
                     count = duplis.count
                     transformations = array("f", duplis.matrices)
                     luxcore_scene.DuplicateObject(src_name, dst_name, count, transformations)
+                    # LuxCore appends the index of the copy to the name
+                    object_names += [dst_name + str(index) for index in range(count)]
 
                     # TODO: support steps and times (motion blur)
                     # steps = 0 # TODO
@@ -120,6 +129,8 @@ def convert(blender_obj, scene, context, luxcore_scene, engine=None):
                     # Delete the object we used for duplication, we don't want it to show up in the scene
                     luxcore_scene.DeleteObject(src_name)
 
+        if exporter:
+            exporter.track_emitted(blender_obj, object_names, light_names)
 
         print("Dupli export took %.3fs" % (time() - start))
     except Exception as error:
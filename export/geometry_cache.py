@@ -0,0 +1,377 @@
+import bpy
+import ctypes
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from .. import utils
+
+# Bump the version when the file layout changes
+MAGIC = b"BLCGEO01"
+# magic, face count, face stride, vertex count, vertex stride, uv stride, color stride
+# (a stride of 0 means that the mesh has no UVs/vertex colors)
+HEADER = struct.Struct("<8s6I")
+EXTENSION = ".geo"
+
+# Modifiers that change the mesh over time even if none of their settings are animated
+TIME_DEPENDENT_MODIFIERS = {
+    "BUILD", "CLOTH", "DYNAMIC_PAINT", "EXPLODE", "FLUID_SIMULATION", "MESH_CACHE",
+    "MESH_SEQUENCE_CACHE", "OCEAN", "PARTICLE_INSTANCE", "PARTICLE_SYSTEM", "SMOKE",
+    "SOFT_BODY", "WAVE",
+}
+
+
+def get_cache_dir(scene):
+    path = scene.luxcore.performance.geometry_cache_path
+
+    if path:
+        return utils.get_abspath(path)
+    else:
+        return os.path.join(tempfile.gettempdir(), "BlendLuxCore_geometry_cache")
+
+
+def clear(directory):
+    """ Delete all cache files in the directory, returns the number of deleted files """
+    if not os.path.isdir(directory):
+        return 0
+
+    count = 0
+    for name in os.listdir(directory):
+        if name.endswith(EXTENSION):
+            os.remove(os.path.join(directory, name))
+            count += 1
+    return count
+
+
+class GeometryCache(object):
+    """
+    Persistent on-disk cache for tessellated meshes, only used in final render.
+
+    The files contain the raw tessface, vertex, UV and vertex color arrays exactly as they
+    are laid out in Blender's memory. On a cache hit, the file is memory-mapped and passed to
+    DefineBlenderMesh() directly, so we neither need to_mesh() nor a copy of the data.
+
+    The key is a hash of the mesh data and the modifier stack. Meshes that change from frame to frame
+    are not cached, each frame would need its own file.
+    When the files get larger than max_size (in bytes), the least recently used ones are deleted.
+    """
+    def __init__(self, directory, max_size):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # Only scan the directory once, store() keeps the size up to date
+        self.size = sum(size for path, size, mtime in self._files())
+
+    def make_key(self, blender_obj, scene):
+        """ Returns None if the object can not be cached """
+        if blender_obj.type != "MESH" or blender_obj.data is None:
+            # Curves, text, metaballs etc. are not supported
+            return None
+
+        if is_deforming(blender_obj):
+            return None
+
+        h = hashlib.sha1()
+        h.update(MAGIC)
+        h.update(bpy.app.version_string.encode())
+        _hash_mesh(h, blender_obj.data)
+
+        if blender_obj.modifiers:
+            if not _hash_modifiers(h, blender_obj, scene):
+                return None
+
+            if blender_obj.vertex_groups:
+                # Vertex weights are used by many modifiers (e.g. armature)
+                _hash_vertex_weights(h, blender_obj.data)
+
+        return h.hexdigest()
+
+    def define_mesh(self, key, luxcore_name, luxcore_scene, mesh_transform):
+        """
+        Define the cached mesh in the luxcore_scene.
+        Returns the mesh definitions like DefineBlenderMesh(), or None if the mesh is not cached.
+        """
+        path = self._path(key)
+
+        try:
+            with open(path, "rb") as file:
+                # Copy-on-write mapping because ctypes needs a writable buffer
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (OSError, ValueError):
+            # File does not exist or is empty
+            self.misses += 1
+            return None
+
+        corrupt_error = None
+
+        try:
+            magic, face_count, face_stride, vertex_count, vertex_stride, uv_stride, color_stride \
+                = HEADER.unpack_from(mapped)
+
+            if magic != MAGIC or len(mapped) != HEADER.size + face_count * (face_stride + uv_stride + color_stride) \
+                                                + vertex_count * vertex_stride:
+                raise ValueError("Corrupt geometry cache file")
+
+            buffer = ctypes.c_char.from_buffer(mapped)
+            try:
+                faces = ctypes.addressof(buffer) + HEADER.size
+                vertices = faces + face_count * face_stride
+                texcoords = vertices + vertex_count * vertex_stride
+                colors = texcoords + face_count * uv_stride
+
+                mesh_definitions = luxcore_scene.DefineBlenderMesh(luxcore_name, face_count, faces, vertex_count,
+                                                                   vertices, texcoords if uv_stride else 0,
+                                                                   colors if color_stride else 0, mesh_transform)
+            finally:
+                # The buffer has to be released before the mapping can be closed
+                del buffer
+        except (struct.error, ValueError) as error:
+            corrupt_error = error
+        except Exception as error:
+            # The mesh is converted with to_mesh() instead
+            print("Geometry cache: could not define %s (%s)" % (path, error))
+            self.misses += 1
+            return None
+        finally:
+            mapped.close()
+
+        if corrupt_error:
+            print("Geometry cache: removing %s (%s)" % (path, corrupt_error))
+            os.remove(path)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        try:
+            # The modification time is used as last access time for the eviction
+            os.utime(path)
+        except OSError:
+            pass
+        return mesh_definitions
+
+    def store(self, key, mesh):
+        """ Write the tessellated mesh (the result of to_mesh()) to the cache """
+        face_count = len(mesh.tessfaces)
+        vertex_count = len(mesh.vertices)
+        face_stride = _stride(mesh.tessfaces)
+        vertex_stride = _stride(mesh.vertices)
+
+        if not face_stride or not vertex_stride:
+            return
+
+        active_uv = utils.find_active_uv(mesh.tessface_uv_textures)
+        uv_data = active_uv.data if active_uv and active_uv.data else None
+        uv_stride = _stride(uv_data) if uv_data else 0
+
+        vertex_color = mesh.tessface_vertex_colors.active
+        color_data = vertex_color.data if vertex_color else None
+        color_stride = _stride(color_data) if color_data else 0
+
+        path = self._path(key)
+        # Write to a temporary file first so other Blender instances never read a half-written file
+        temp_path = "%s.%d.tmp" % (path, os.getpid())
+
+        try:
+            with open(temp_path, "wb") as file:
+                file.write(HEADER.pack(MAGIC, face_count, face_stride, vertex_count, vertex_stride,
+                                       uv_stride, color_stride))
+                file.write(_raw_bytes(mesh.tessfaces, face_stride))
+                file.write(_raw_bytes(mesh.vertices, vertex_stride))
+                if uv_stride:
+                    file.write(_raw_bytes(uv_data, uv_stride))
+                if color_stride:
+                    file.write(_raw_bytes(color_data, color_stride))
+            os.replace(temp_path, path)
+        except OSError as error:
+            # Not critical, the mesh was already exported
+            print("Could not write geometry cache file %s: %s" % (path, error))
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        self.size += os.path.getsize(path)
+        if self.size > self.max_size:
+            self._evict()
+
+    def _evict(self):
+        """ Delete the least recently used files until the cache is smaller than max_size """
+        files = sorted(self._files(), key=lambda file: file[2])
+        self.size = sum(size for path, size, mtime in files)
+        count = 0
+
+        for path, size, mtime in files:
+            if self.size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # Might have been deleted by another Blender instance
+                continue
+            self.size -= size
+            count += 1
+
+        print("Geometry cache: deleted %d files, the cache has %.1f MB now" % (count, self.size / 1024**2))
+
+    def _files(self):
+        """ Yields (path, size, modification time) of the cache files """
+        for name in os.listdir(self.directory):
+            if name.endswith(EXTENSION):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + EXTENSION)
+
+
+def _stride(collection):
+    """
+    Size of one element in Blender's memory, found by comparing the addresses of
+    the first two elements. Returns 0 if the collection has less than two elements.
+    """
+    if len(collection) < 2:
+        return 0
+    return collection[1].as_pointer() - collection[0].as_pointer()
+
+
+def _raw_bytes(collection, stride):
+    return ctypes.string_at(collection[0].as_pointer(), len(collection) * stride)
+
+
+def _hash_collection(h, collection):
+    h.update(str(len(collection)).encode())
+    stride = _stride(collection)
+
+    if stride:
+        h.update(_raw_bytes(collection, stride))
+    else:
+        # Zero or one elements, not worth a special case
+        for elem in collection:
+            h.update(repr(list(elem.bl_rna.properties.keys())).encode())
+            for prop in elem.bl_rna.properties:
+                h.update(repr(getattr(elem, prop.identifier, None)).encode())
+
+
+def _hash_mesh(h, mesh):
+    _hash_collection(h, mesh.vertices)
+    _hash_collection(h, mesh.edges)
+    _hash_collection(h, mesh.loops)
+    _hash_collection(h, mesh.polygons)
+
+    uv_layer = mesh.uv_layers.active
+    if uv_layer:
+        _hash_collection(h, uv_layer.data)
+
+    vertex_colors = mesh.vertex_colors.active
+    if vertex_colors:
+        _hash_collection(h, vertex_colors.data)
+
+    if mesh.shape_keys:
+        for key_block in mesh.shape_keys.key_blocks:
+            h.update(repr((key_block.name, key_block.value, key_block.mute)).encode())
+            _hash_collection(h, key_block.data)
+
+
+def _hash_vertex_weights(h, mesh):
+    # Slow (Python loop over all vertices), but still a lot faster than evaluating the modifiers
+    for vertex in mesh.vertices:
+        for group in vertex.groups:
+            h.update(struct.pack("<if", group.group, group.weight))
+
+
+def _hash_modifiers(h, blender_obj, scene):
+    """ Returns False if the result of the modifier stack can not be described by a hash """
+    # Simplify settings influence the subdivision levels used by to_mesh()
+    render = scene.render
+    h.update(repr((render.use_simplify, render.simplify_subdivision_render)).encode())
+    has_object_dependency = False
+
+    for modifier in blender_obj.modifiers:
+        h.update(repr((modifier.type, modifier.show_render)).encode())
+
+        for prop in modifier.bl_rna.properties:
+            if prop.identifier in {"rna_type", "name"}:
+                continue
+
+            value = getattr(modifier, prop.identifier, None)
+
+            if isinstance(value, bpy.types.Object):
+                if not _hash_object_dependency(h, value):
+                    return False
+                has_object_dependency = True
+            elif isinstance(value, bpy.types.ID):
+                # Textures, images etc., their content can change without a change of the name
+                return False
+            elif hasattr(value, "__len__") and not isinstance(value, str):
+                h.update(repr(list(value)).encode())
+            else:
+                h.update(repr(value).encode())
+
+    if has_object_dependency:
+        # The result depends on the transformation relative to the referenced objects
+        h.update(repr([list(row) for row in blender_obj.matrix_world]).encode())
+    return True
+
+
+def _hash_object_dependency(h, obj):
+    """
+    For objects that are referenced by modifiers, e.g. boolean cutters or armatures.
+    Returns False if the object can influence the mesh in a way that is not hashed.
+    """
+    h.update(obj.name.encode())
+    h.update(repr([list(row) for row in obj.matrix_world]).encode())
+
+    if obj.type == "MESH" and obj.data:
+        if any(modifier.show_render for modifier in obj.modifiers):
+            # The evaluated mesh of the object is used
+            return False
+        _hash_mesh(h, obj.data)
+    elif obj.type == "ARMATURE" and obj.pose:
+        for bone in obj.pose.bones:
+            h.update(repr([list(row) for row in bone.matrix]).encode())
+    elif obj.type != "EMPTY":
+        # Curve and lattice deformers, the shape of text or surface objects etc.
+        return False
+    return True
+
+
+def _has_animation(datablock):
+    anim = getattr(datablock, "animation_data", None)
+    return anim is not None and (anim.action is not None or len(anim.drivers) > 0)
+
+
+def is_deforming(blender_obj):
+    """
+    Returns True if the mesh of the object (in object space) might change from frame to frame.
+    Objects that are only moved, rotated or scaled return False.
+    """
+    data = blender_obj.data
+
+    if _has_animation(data):
+        return True
+
+    shape_keys = getattr(data, "shape_keys", None)
+    if shape_keys and _has_animation(shape_keys):
+        return True
+
+    if blender_obj.modifiers and _has_animation(blender_obj):
+        # Modifier settings are animated via the object
+        return True
+
+    for modifier in blender_obj.modifiers:
+        if modifier.type in TIME_DEPENDENT_MODIFIERS:
+            return True
+
+        for prop in modifier.bl_rna.properties:
+            value = getattr(modifier, prop.identifier, None)
+            if isinstance(value, bpy.types.Object) and (_has_animation(value) or value.parent):
+                # The referenced object (or one of its parents) might move
+                return True
+
+    return False
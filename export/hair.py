@@ -4,7 +4,7 @@ from .. import utils
 from time import time
 import math
 
-def convert_hair(blender_obj, psys, luxcore_scene, scene, context=None, engine=None):
+def convert_hair(blender_obj, psys, luxcore_scene, scene, context=None, engine=None, exporter=None):
     try:
         assert psys.settings.render_type == "PATH"
 
@@ -222,24 +222,32 @@ def convert_hair(blender_obj, psys, luxcore_scene, scene, context=None, engine=N
         ## Convert material
         strandsProps = pyluxcore.Properties()
 
-        lux_mat_name, mat_props = material.convert(mat, scene, context)
-        strandsProps.Set(mat_props)
+        if exporter:
+            # Use the material cache, the material is only converted once per export
+            lux_mat_name = exporter.material_export_cache.convert(mat, scene, context, luxcore_scene)
+        else:
+            lux_mat_name, mat_props = material.convert(mat, scene, context)
+            strandsProps.Set(mat_props)
 
         # The hair shape is located at world origin and implicitly instanced, so we have to
         # move it to the correct position
         transform = utils.matrix_to_list(blender_obj.matrix_world, scene, apply_worldscale=True)
 
         prefix = "scene.objects." + luxcore_shape_name + "."
-
-        strandsProps.Set(pyluxcore.Property(prefix + "material", lux_mat_name))
-        strandsProps.Set(pyluxcore.Property(prefix + "shape", luxcore_shape_name))
-        strandsProps.Set(pyluxcore.Property(prefix + "transformation", transform))
-
         visible_to_cam = utils.is_obj_visible_to_cam(blender_obj, scene, context)
-        strandsProps.Set(pyluxcore.Property(prefix + "camerainvisible", not visible_to_cam))
+        definitions = {
+            "material": lux_mat_name,
+            "shape": luxcore_shape_name,
+            "transformation": transform,
+            "camerainvisible": not visible_to_cam,
+        }
+        strandsProps.Set(utils.create_props(prefix, definitions))
 
         luxcore_scene.Parse(strandsProps)
 
+        if exporter:
+            exporter.track_emitted(blender_obj, [luxcore_shape_name])
+
         if not context:
             # Resolution was changed to "RENDER" for final renders, change it back
             psys.set_resolution(scene, blender_obj, "PREVIEW")
@@ -1,9 +1,13 @@
-from ..bin import pyluxcore
 from .. import utils
 from .image import ImageExporter
 
 
 def convert(scene, context=None):
+    return utils.create_props("", convert_definitions(scene, context))
+
+
+def convert_definitions(scene, context=None):
+    """ Like convert(), but returns the definitions (with full keys) instead of pyluxcore.Properties """
     try:
         prefix = "film.imagepipelines.0."
         definitions = {}
@@ -11,7 +15,7 @@ def convert(scene, context=None):
         if scene.camera is None:
             # Can not work without a camera
             _fallback(definitions)
-            return utils.create_props(prefix, definitions)
+            return utils.add_prefix(prefix, definitions)
 
         pipeline = scene.camera.data.luxcore.imagepipeline
         use_filesaver = utils.use_filesaver(context, scene)
@@ -52,13 +56,13 @@ def convert(scene, context=None):
             # but now we export for luxcoreui)
             index = _gamma(definitions, index)
 
-        return utils.create_props(prefix, definitions)
+        return utils.add_prefix(prefix, definitions)
     except Exception as error:
         import traceback
         traceback.print_exc()
         msg = 'Imagepipeline: %s' % error
         scene.luxcore.errorlog.add_warning(msg)
-        return pyluxcore.Properties()
+        return {}
 
 
 def use_backgroundimage(context, scene):
@@ -24,154 +24,186 @@ def convert_lamp(blender_obj, scene, context, luxcore_scene, dupli_suffix=""):
         # If this light was previously defined as a light, delete it
         luxcore_scene.DeleteLight(luxcore_name)
 
-        prefix = "scene.lights." + luxcore_name + "."
-        definitions = {}
-        exported_light = ExportedLight(luxcore_name)
-
         lamp = blender_obj.data
 
-        matrix = blender_obj.matrix_world
-        sun_dir = _calc_sun_dir(blender_obj)
+        if is_meshlight(lamp):
+            # area (mesh light)
+            gain, samples, importance = _convert_common_props(lamp)
+            return _convert_area_lamp(blender_obj, scene, context, luxcore_scene, gain, samples, importance)
 
-        # Common light settings shared by all light types
-        # Note: these variables are also passed to the area light export function
-        gain, samples, importance = _convert_common_props(lamp)
-        definitions["gain"] = gain
-        definitions["samples"] = samples
-        definitions["importance"] = importance
+        prefix, definitions, exported_light = _lamp_definitions(blender_obj, scene, luxcore_name)
+        props = utils.create_props(prefix, definitions)
+        return props, exported_light
+    except Exception as error:
+        msg = 'Light "%s": %s' % (blender_obj.name, error)
+        scene.luxcore.errorlog.add_warning(msg)
+        import traceback
+        traceback.print_exc()
+        return pyluxcore.Properties(), None
 
-        if lamp.type == "POINT":
-            if lamp.luxcore.image or lamp.luxcore.ies.use:
-                # mappoint/mapsphere
-                definitions["type"] = "mappoint" if lamp.luxcore.radius == 0 else "mapsphere"
-
-                if lamp.luxcore.image:
-                    try:
-                        filepath = ImageExporter.export(lamp.luxcore.image)
-                        definitions["mapfile"] = filepath
-                        definitions["gamma"] = lamp.luxcore.gamma
-                    except OSError as error:
-                        msg = 'Lamp "%s": %s' % (blender_obj.name, error)
-                        scene.luxcore.errorlog.add_warning(msg)
-                        # Fallback
-                        definitions["type"] = "point"
-                        # Signal that the image is missing
-                        definitions["gain"] = [x * lamp.luxcore.gain for x in MISSING_IMAGE_COLOR]
 
-                try:
-                    export_ies(definitions, lamp.luxcore.ies, lamp.library)
-                except OSError as error:
-                    msg = 'Lamp "%s": %s' % (blender_obj.name, error)
-                    scene.luxcore.errorlog.add_warning(msg)
-            else:
-                # point/sphere
-                definitions["type"] = "point" if lamp.luxcore.radius == 0 else "sphere"
-
-            definitions["efficency"] = lamp.luxcore.efficacy
-            definitions["power"] = lamp.luxcore.power
-            # Position is set by transformation property
-            definitions["position"] = [0, 0, 0]
-            transformation = utils.matrix_to_list(matrix, scene, apply_worldscale=True)
-            definitions["transformation"] = transformation
-
-            if lamp.luxcore.radius > 0:
-                worldscale = utils.get_worldscale(scene, as_scalematrix=False)
-                definitions["radius"] = lamp.luxcore.radius * worldscale
-
-        elif lamp.type == "SUN":
-            distant_dir = [-sun_dir[0], -sun_dir[1], -sun_dir[2]]
-
-            if lamp.luxcore.sun_type == "sun":
-                # sun
-                definitions["type"] = "sun"
-                definitions["dir"] = sun_dir
-                definitions["turbidity"] = lamp.luxcore.turbidity
-                definitions["relsize"] = lamp.luxcore.relsize
-            elif lamp.luxcore.theta < 0.05:
-                # sharpdistant
-                definitions["type"] = "sharpdistant"
-                definitions["direction"] = distant_dir
-            else:
-                # distant
-                definitions["type"] = "distant"
-                definitions["direction"] = distant_dir
-                definitions["theta"] = lamp.luxcore.theta
+def snapshot_lamp(blender_obj, scene, context):
+    """
+    Read the lamp settings into plain Python definitions without creating any pyluxcore objects,
+    so they can be converted to properties later (see Exporter.create_session()).
+    Meshlights need to define a mesh and are not supported here, check is_meshlight() first.
+    Returns (prefix, definitions, exported_light), or (None, None, None) if an error happened.
+    """
+    try:
+        assert not is_meshlight(blender_obj.data)
+        luxcore_name = utils.get_luxcore_name(blender_obj, context)
+        return _lamp_definitions(blender_obj, scene, luxcore_name)
+    except Exception as error:
+        msg = 'Light "%s": %s' % (blender_obj.name, error)
+        scene.luxcore.errorlog.add_warning(msg)
+        import traceback
+        traceback.print_exc()
+        return None, None, None
 
-        elif lamp.type == "SPOT":
-            coneangle = math.degrees(lamp.spot_size) / 2
-            conedeltaangle = math.degrees(lamp.spot_size / 2 * lamp.spot_blend)
+
+def is_meshlight(lamp):
+    """ Area lamps are exported as a plane with emissive material, unless they are lasers """
+    return lamp.type == "AREA" and not lamp.luxcore.is_laser
+
+
+def _lamp_definitions(blender_obj, scene, luxcore_name):
+    prefix = "scene.lights." + luxcore_name + "."
+    definitions = {}
+    exported_light = ExportedLight(luxcore_name)
+
+    lamp = blender_obj.data
+
+    matrix = blender_obj.matrix_world
+    sun_dir = _calc_sun_dir(blender_obj)
+
+    # Common light settings shared by all light types
+    gain, samples, importance = _convert_common_props(lamp)
+    definitions["gain"] = gain
+    definitions["samples"] = samples
+    definitions["importance"] = importance
+
+    if lamp.type == "POINT":
+        if lamp.luxcore.image or lamp.luxcore.ies.use:
+            # mappoint/mapsphere
+            definitions["type"] = "mappoint" if lamp.luxcore.radius == 0 else "mapsphere"
 
             if lamp.luxcore.image:
-                # projection
                 try:
-                    definitions["mapfile"] = ImageExporter.export(lamp.luxcore.image)
-                    definitions["type"] = "projection"
-                    definitions["fov"] = coneangle * 2
+                    filepath = ImageExporter.export(lamp.luxcore.image)
+                    definitions["mapfile"] = filepath
                     definitions["gamma"] = lamp.luxcore.gamma
                 except OSError as error:
                     msg = 'Lamp "%s": %s' % (blender_obj.name, error)
                     scene.luxcore.errorlog.add_warning(msg)
                     # Fallback
-                    definitions["type"] = "spot"
+                    definitions["type"] = "point"
                     # Signal that the image is missing
                     definitions["gain"] = [x * lamp.luxcore.gain for x in MISSING_IMAGE_COLOR]
-            else:
-                # spot
+
+            try:
+                export_ies(definitions, lamp.luxcore.ies, lamp.library)
+            except OSError as error:
+                msg = 'Lamp "%s": %s' % (blender_obj.name, error)
+                scene.luxcore.errorlog.add_warning(msg)
+        else:
+            # point/sphere
+            definitions["type"] = "point" if lamp.luxcore.radius == 0 else "sphere"
+
+        definitions["efficency"] = lamp.luxcore.efficacy
+        definitions["power"] = lamp.luxcore.power
+        # Position is set by transformation property
+        definitions["position"] = [0, 0, 0]
+        transformation = utils.matrix_to_list(matrix, scene, apply_worldscale=True)
+        definitions["transformation"] = transformation
+
+        if lamp.luxcore.radius > 0:
+            worldscale = utils.get_worldscale(scene, as_scalematrix=False)
+            definitions["radius"] = lamp.luxcore.radius * worldscale
+
+    elif lamp.type == "SUN":
+        distant_dir = [-sun_dir[0], -sun_dir[1], -sun_dir[2]]
+
+        if lamp.luxcore.sun_type == "sun":
+            # sun
+            definitions["type"] = "sun"
+            definitions["dir"] = sun_dir
+            definitions["turbidity"] = lamp.luxcore.turbidity
+            definitions["relsize"] = lamp.luxcore.relsize
+        elif lamp.luxcore.theta < 0.05:
+            # sharpdistant
+            definitions["type"] = "sharpdistant"
+            definitions["direction"] = distant_dir
+        else:
+            # distant
+            definitions["type"] = "distant"
+            definitions["direction"] = distant_dir
+            definitions["theta"] = lamp.luxcore.theta
+
+    elif lamp.type == "SPOT":
+        coneangle = math.degrees(lamp.spot_size) / 2
+        conedeltaangle = math.degrees(lamp.spot_size / 2 * lamp.spot_blend)
+
+        if lamp.luxcore.image:
+            # projection
+            try:
+                definitions["mapfile"] = ImageExporter.export(lamp.luxcore.image)
+                definitions["type"] = "projection"
+                definitions["fov"] = coneangle * 2
+                definitions["gamma"] = lamp.luxcore.gamma
+            except OSError as error:
+                msg = 'Lamp "%s": %s' % (blender_obj.name, error)
+                scene.luxcore.errorlog.add_warning(msg)
+                # Fallback
                 definitions["type"] = "spot"
-                definitions["coneangle"] = coneangle
-                definitions["conedeltaangle"] = conedeltaangle
+                # Signal that the image is missing
+                definitions["gain"] = [x * lamp.luxcore.gain for x in MISSING_IMAGE_COLOR]
+        else:
+            # spot
+            definitions["type"] = "spot"
+            definitions["coneangle"] = coneangle
+            definitions["conedeltaangle"] = conedeltaangle
+
+        definitions["efficency"] = lamp.luxcore.efficacy
+        definitions["power"] = lamp.luxcore.power
+        # Position and direction are set by transformation property
+        definitions["position"] = [0, 0, 0]
+        definitions["target"] = [0, 0, -1]
+
+        spot_fix = Matrix.Rotation(math.radians(-90.0), 4, "Z")
+        transformation = utils.matrix_to_list(matrix * spot_fix, scene, apply_worldscale=True)
+        definitions["transformation"] = transformation
 
-            definitions["efficency"] = lamp.luxcore.efficacy
-            definitions["power"] = lamp.luxcore.power
-            # Position and direction are set by transformation property
-            definitions["position"] = [0, 0, 0]
-            definitions["target"] = [0, 0, -1]
+    elif lamp.type == "HEMI":
+        if lamp.luxcore.image:
+            _convert_infinite(definitions, lamp, scene, matrix)
+        else:
+            # Fallback
+            definitions["type"] = "constantinfinite"
 
-            spot_fix = Matrix.Rotation(math.radians(-90.0), 4, "Z")
-            transformation = utils.matrix_to_list(matrix * spot_fix, scene, apply_worldscale=True)
-            definitions["transformation"] = transformation
+    elif lamp.type == "AREA":
+        # Area lamps are only handled here if they are lasers, meshlights are exported by convert_lamp()
+        assert lamp.luxcore.is_laser
+        definitions["type"] = "laser"
+        definitions["radius"] = lamp.size / 2 * utils.get_worldscale(scene, as_scalematrix=False)
 
-        elif lamp.type == "HEMI":
-            if lamp.luxcore.image:
-                _convert_infinite(definitions, lamp, scene, matrix)
-            else:
-                # Fallback
-                definitions["type"] = "constantinfinite"
+        definitions["efficency"] = lamp.luxcore.efficacy
+        definitions["power"] = lamp.luxcore.power
+        # Position and direction are set by transformation property
+        definitions["position"] = [0, 0, 0]
+        definitions["target"] = [0, 0, -1]
 
-        elif lamp.type == "AREA":
-            if lamp.luxcore.is_laser:
-                # laser
-                definitions["type"] = "laser"
-                definitions["radius"] = lamp.size / 2 * utils.get_worldscale(scene, as_scalematrix=False)
-
-                definitions["efficency"] = lamp.luxcore.efficacy
-                definitions["power"] = lamp.luxcore.power
-                # Position and direction are set by transformation property
-                definitions["position"] = [0, 0, 0]
-                definitions["target"] = [0, 0, -1]
-
-                spot_fix = Matrix.Rotation(math.radians(-90.0), 4, "Z")
-                transformation = utils.matrix_to_list(matrix * spot_fix, scene, apply_worldscale=True)
-                definitions["transformation"] = transformation
-            else:
-                # area (mesh light)
-                return _convert_area_lamp(blender_obj, scene, context, luxcore_scene, gain, samples, importance)
+        spot_fix = Matrix.Rotation(math.radians(-90.0), 4, "Z")
+        transformation = utils.matrix_to_list(matrix * spot_fix, scene, apply_worldscale=True)
+        definitions["transformation"] = transformation
 
-        else:
-            # Can only happen if Blender changes its lamp types
-            raise Exception("Unkown light type", lamp.type, 'in lamp "%s"' % blender_obj.name)
+    else:
+        # Can only happen if Blender changes its lamp types
+        raise Exception("Unkown light type", lamp.type, 'in lamp "%s"' % blender_obj.name)
 
-        _indirect_light_visibility(definitions, lamp)
-        _visibilitymap(definitions, lamp)
+    _indirect_light_visibility(definitions, lamp)
+    _visibilitymap(definitions, lamp)
 
-        props = utils.create_props(prefix, definitions)
-        return props, exported_light
-    except Exception as error:
-        msg = 'Light "%s": %s' % (blender_obj.name, error)
-        scene.luxcore.errorlog.add_warning(msg)
-        import traceback
-        traceback.print_exc()
-        return pyluxcore.Properties(), None
+    return prefix, definitions, exported_light
 
 
 def convert_world(world, scene):
@@ -1,5 +1,4 @@
 import math
-from ..bin import pyluxcore
 from .. import utils
 
 
@@ -23,7 +22,7 @@ def convert(context, scene, objects, exported_objects):
             del matrices[prefix]
 
     # Export the properties for moving objects
-    props = pyluxcore.Properties()
+    batch = utils.PropsBatch()
 
     for prefix, matrix_steps in matrices.items():
         for step in range(steps):
@@ -34,7 +33,9 @@ def convert(context, scene, objects, exported_objects):
                 "motion.%d.time" % step: time,
                 "motion.%d.transformation" % step: transformation,
             }
-            props.Set(utils.create_props(prefix, definitions))
+            batch.add(prefix, definitions)
+
+    props = batch.to_props()
 
     # We need this information outside
     is_camera_moving = "scene.camera." in matrices
@@ -0,0 +1,78 @@
+import json
+from contextlib import contextmanager
+from time import time
+
+
+class ExportProfiler(object):
+    """
+    Records wall time and call count of the export phases and of each object.
+    Phases can be nested (e.g. "to_mesh" is part of the object that is exported),
+    so the phase times do not add up to the total export time.
+    """
+    def __init__(self):
+        # Both dicts map a name to [seconds, calls]
+        self.phases = {}
+        self.objects = {}
+        self.total = 0
+
+    def reset(self):
+        self.phases = {}
+        self.objects = {}
+        self.total = 0
+
+    @contextmanager
+    def phase(self, name):
+        start = time()
+        try:
+            yield
+        finally:
+            self._add(self.phases, name, time() - start)
+
+    @contextmanager
+    def object(self, name):
+        start = time()
+        try:
+            yield
+        finally:
+            self._add(self.objects, name, time() - start)
+
+    def sorted_phases(self):
+        """ Returns a list of (name, seconds, calls) tuples, slowest first """
+        return self._sorted(self.phases)
+
+    def slowest_objects(self, count=None):
+        """ Returns a list of (name, seconds, calls) tuples, slowest first """
+        return self._sorted(self.objects)[:count]
+
+    def to_dict(self):
+        return {
+            "total": self.total,
+            "phases": [{"name": name, "seconds": seconds, "calls": calls}
+                       for name, seconds, calls in self.sorted_phases()],
+            "objects": [{"name": name, "seconds": seconds, "calls": calls}
+                        for name, seconds, calls in self.slowest_objects()],
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def _add(self, entries, name, elapsed):
+        try:
+            entry = entries[name]
+            entry[0] += elapsed
+            entry[1] += 1
+        except KeyError:
+            entries[name] = [elapsed, 1]
+
+    def _sorted(self, entries):
+        return sorted(((name, seconds, calls) for name, (seconds, calls) in entries.items()),
+                      key=lambda entry: entry[1], reverse=True)
+
+
+class NullProfiler(ExportProfiler):
+    """ Used when there is no exporter (e.g. material preview), records nothing """
+    def _add(self, entries, name, elapsed):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
@@ -6,6 +6,8 @@ from bgl import *
 from ..bin import pyluxcore
 from bpy.app.handlers import persistent
 from ..export.image import ImageExporter
+from ..export import caches
+from ..export.caches import ChangeCounter
 from .. import utils
 from ..utils import compatibility
 
@@ -46,6 +48,10 @@ last_name_update = time()
 
 @persistent
 def luxcore_scene_update_post(scene):
+    # Has to happen in every update because the update flags are cleared afterwards
+    caches.collect_object_updates(scene)
+    ChangeCounter.collect_updates(scene)
+
     global last_name_update
     if time() - last_name_update < NAME_UPDATE_INTERVAL:
         return
@@ -1,5 +1,4 @@
 import bpy
-from ...bin import pyluxcore
 from ... import utils
 from ...utils import node as utils_node
 from bpy.props import BoolProperty, PointerProperty, IntProperty
@@ -83,19 +82,23 @@ class LuxCoreNodeMatOutput(LuxCoreNodeOutput):
         # Export the material
         exported_name = self.inputs["Material"].export(props, luxcore_name)
 
-        # Attach the volumes
-        if interior_volume_name:
-            props.Set(pyluxcore.Property(prefix + "volume.interior", interior_volume_name))
-        if exterior_volume_name:
-            props.Set(pyluxcore.Property(prefix + "volume.exterior", exterior_volume_name))
-
         if exported_name is None or exported_name != luxcore_name:
             # Export failed, e.g. because no node is linked or it's not a material node
             # Define a black material that signals an unconnected material socket
             self._convert_fallback(props, luxcore_name)
 
-        props.Set(pyluxcore.Property(prefix + "id", self.id))
-        props.Set(pyluxcore.Property(prefix + "shadowcatcher.enable", self.is_shadow_catcher))
+        definitions = {
+            "id": self.id,
+            "shadowcatcher.enable": self.is_shadow_catcher,
+        }
+
+        # Attach the volumes
+        if interior_volume_name:
+            definitions["volume.interior"] = interior_volume_name
+        if exterior_volume_name:
+            definitions["volume.exterior"] = exterior_volume_name
+
+        props.Set(utils.create_props(prefix, definitions))
 
     def _convert_volume(self, node_tree, props):
         if node_tree is None:
@@ -114,5 +117,8 @@ class LuxCoreNodeMatOutput(LuxCoreNodeOutput):
     
     def _convert_fallback(self, props, luxcore_name):
         prefix = "scene.materials." + luxcore_name + "."
-        props.Set(pyluxcore.Property(prefix + "type", "matte"))
-        props.Set(pyluxcore.Property(prefix + "kd", [0, 0, 0]))
+        definitions = {
+            "type": "matte",
+            "kd": [0, 0, 0],
+        }
+        props.Set(utils.create_props(prefix, definitions))
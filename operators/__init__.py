@@ -18,6 +18,39 @@ class LUXCORE_OT_errorlog_clear(bpy.types.Operator):
         return {"FINISHED"}
 
 
+class LUXCORE_OT_clear_geometry_cache(bpy.types.Operator):
+    bl_idname = "luxcore.clear_geometry_cache"
+    bl_label = "Clear Geometry Cache"
+    bl_description = "Delete all cached meshes from the geometry cache directory"
+
+    def execute(self, context):
+        from ..export import geometry_cache
+        directory = geometry_cache.get_cache_dir(context.scene)
+
+        try:
+            count = geometry_cache.clear(directory)
+        except OSError as error:
+            self.report({"ERROR"}, "Could not clear geometry cache: %s" % error)
+            return {"CANCELLED"}
+
+        self.report({"INFO"}, "Deleted %d cached meshes from %s" % (count, directory))
+        return {"FINISHED"}
+
+
+class LUXCORE_OT_copy_export_report(bpy.types.Operator):
+    bl_idname = "luxcore.copy_export_report"
+    bl_label = "Copy Report"
+    bl_description = "Copy the timings of the last profiled export to the clipboard (JSON format)"
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene.luxcore.performance.profile_report
+
+    def execute(self, context):
+        context.window_manager.clipboard = context.scene.luxcore.performance.profile_report
+        return {"FINISHED"}
+
+
 class LUXCORE_OT_switch_texture_context(bpy.types.Operator):
     bl_idname = "luxcore.switch_texture_context"
     bl_label = ""
@@ -1,7 +1,33 @@
 import bpy
-from bpy.props import PointerProperty, BoolProperty
+from bpy.props import PointerProperty, BoolProperty, EnumProperty
 from bpy.types import PropertyGroup
 
+# The identifiers are the names of the LuxCore film outputs
+pinned_items = [(name, label, "", 1 << i) for i, (name, label) in enumerate([
+    ("RGB", "RGB"),
+    ("RGBA", "RGBA"),
+    ("ALPHA", "Alpha"),
+    ("DEPTH", "Depth"),
+    ("MATERIAL_ID", "Material ID"),
+    ("OBJECT_ID", "Object ID"),
+    ("EMISSION", "Emission"),
+    ("DIRECT_DIFFUSE", "Direct Diffuse"),
+    ("DIRECT_GLOSSY", "Direct Glossy"),
+    ("INDIRECT_DIFFUSE", "Indirect Diffuse"),
+    ("INDIRECT_GLOSSY", "Indirect Glossy"),
+    ("INDIRECT_SPECULAR", "Indirect Specular"),
+    ("POSITION", "Position"),
+    ("SHADING_NORMAL", "Shading Normal"),
+    ("GEOMETRY_NORMAL", "Geometry Normal"),
+    ("UV", "UV"),
+    ("DIRECT_SHADOW_MASK", "Direct Shadow Mask"),
+    ("INDIRECT_SHADOW_MASK", "Indirect Shadow Mask"),
+    ("RAYCOUNT", "Raycount"),
+    ("SAMPLECOUNT", "Samplecount"),
+    ("CONVERGENCE", "Convergence"),
+    ("IRRADIANCE", "Irradiance"),
+])]
+
 
 # Attached to render layer
 class LuxCoreAOVSettings(PropertyGroup):
@@ -69,3 +95,8 @@ class LuxCoreAOVSettings(PropertyGroup):
                        description="")  # TODO description
     irradiance = BoolProperty(name="Irradiance", default=False,
                        description="Surface irradiance")
+
+    # AOVs that are updated on every film refresh, even if "Refresh All AOVs" is disabled
+    pinned = EnumProperty(name="Pinned AOVs", items=pinned_items, options={"ENUM_FLAG"}, default=set(),
+                          description="AOVs that are updated on every film refresh during the render. "
+                                      "The other AOVs are empty until the render ends")
@@ -1,9 +1,54 @@
 import bpy
-from bpy.props import IntProperty
+from bpy.props import IntProperty, FloatProperty, EnumProperty, BoolProperty
+
+viewport_precision_items = [
+    ("FLOAT", "Full (32 bit)", "Upload the film as 32 bit float, best color fidelity", 0),
+    ("HALF", "Half (16 bit)", "Upload the film as 16 bit float, half the bandwidth with barely visible differences", 1),
+    ("BYTE", "Low (8 bit)", "Upload the film as 8 bit sRGB, a quarter of the bandwidth. "
+                            "Values brighter than 1 are clipped, so e.g. the Filmic view transform "
+                            "can not compress highlights", 2),
+]
 
 
 class LuxCoreDisplaySettings(bpy.types.PropertyGroup):
     interval = IntProperty(name="Refresh Interval (s)", default=10, min=5,
-                           description="Time between film refreshes, in seconds")
+                           description="Time between film refreshes, in seconds. With adaptive refresh, "
+                                       "this is the longest interval unless refreshes take too long")
+    use_adaptive_refresh = BoolProperty(name="Adaptive Refresh", default=True,
+                                        description="Refresh the film often at the start of the render and "
+                                                    "less often as the image converges, based on the "
+                                                    "measured duration of the refreshes")
+    refresh_overhead = FloatProperty(name="Max Overhead", default=5, min=1, max=50, subtype="PERCENTAGE",
+                                     description="Maximum share of the render time that is spent on film "
+                                                 "refreshes. Refreshes of large images are done less often")
     viewport_halt_time = IntProperty(name="Viewport Halt Time (s)", default=10, min=1,
                                      description="How long to render in the viewport")
+    viewport_precision = EnumProperty(name="Precision", items=viewport_precision_items, default="FLOAT",
+                                      description="Precision of the image that is sent to the GPU for display. "
+                                                  "Lower precision increases the framerate on high resolution displays")
+    use_adaptive_resolution = BoolProperty(name="Adaptive Resolution", default=False,
+                                           description="Render the viewport at lower resolution while navigating "
+                                                       "or moving objects, refine to full resolution afterwards")
+    adaptive_target_fps = IntProperty(name="Target FPS", default=15, min=1, soft_max=60,
+                                      description="Framerate the adaptive resolution tries to reach "
+                                                  "during navigation. Higher values lead to lower resolution")
+    use_frame_fetcher = BoolProperty(name="Fetch Frames in Background", default=True,
+                                     description="Copy new frames from the render in a background thread, "
+                                                 "so a slow render does not slow down the Blender interface")
+    use_edit_coalescing = BoolProperty(name="Merge Quick Edits", default=True,
+                                       description="Merge changes that happen in quick succession (e.g. while "
+                                                   "dragging a slider) into one scene edit, so the viewport "
+                                                   "render can finish a pass in between")
+    refresh_all_aovs = BoolProperty(name="Refresh All AOVs", default=False,
+                                    description="Update all AOVs on every film refresh during final render. "
+                                                "If disabled, only the Combined pass and the pinned AOVs are "
+                                                "shown while rendering, the other AOVs are empty until the "
+                                                "render ends")
+    use_film_refresh_worker = BoolProperty(name="Refresh Film in Background", default=True,
+                                           description="Import the film in a background thread during final "
+                                                       "render, so cancelling and halt conditions stay "
+                                                       "responsive with large images")
+    show_hud = BoolProperty(name="Show Performance Overlay", default=False,
+                            description="Show graphs of the render speed and of the time spent in the "
+                                        "addon (film fetch, texture upload, change detection, scene edits) "
+                                        "in the viewport")
@@ -0,0 +1,77 @@
+import bpy
+from bpy.props import BoolProperty, StringProperty, IntProperty, FloatProperty, CollectionProperty
+
+GEOMETRY_CACHE_DESC = (
+    "Store the tessellated meshes on disk and load them in the next final render "
+    "if the mesh and its modifiers did not change (meshes that deform in animations are not cached); "
+    "Saves the modifier evaluation, but needs disk space"
+)
+GEOMETRY_CACHE_PATH_DESC = "Folder for the geometry cache files. If empty, the temp directory is used"
+GEOMETRY_CACHE_SIZE_DESC = (
+    "Maximum size of the geometry cache files on disk. When the cache gets larger, "
+    "the files that were not used for the longest time are deleted"
+)
+
+SHARE_LAYER_EXPORT_DESC = (
+    "Export the scene only once for all render layers. Each layer only deletes or adds "
+    "objects and swaps the override material before rendering"
+)
+
+EXPORT_PROFILER_DESC = (
+    "Store the time spent in each export phase and for each object after every export. "
+    "The slowest objects are shown in this panel, the full report can be copied as JSON"
+)
+
+# Only this many of the slowest objects are kept for the UI, the JSON report contains all
+MAX_PROFILE_OBJECTS = 100
+
+
+class LuxCoreProfileEntry(bpy.types.PropertyGroup):
+    name = StringProperty()
+    seconds = FloatProperty()
+    calls = IntProperty()
+
+
+class LuxCorePerformanceSettings(bpy.types.PropertyGroup):
+    """
+    Settings that only influence the export/render speed, not the rendered image.
+    Stored in scene.luxcore.performance
+    """
+    use_geometry_cache = BoolProperty(name="Geometry Cache", default=False,
+                                      description=GEOMETRY_CACHE_DESC)
+    geometry_cache_path = StringProperty(name="", subtype="DIR_PATH",
+                                         description=GEOMETRY_CACHE_PATH_DESC)
+    geometry_cache_size = IntProperty(name="Max Size (MB)", default=4096, min=1, soft_min=64,
+                                      description=GEOMETRY_CACHE_SIZE_DESC)
+    use_shared_layer_export = BoolProperty(name="Share Export Between Layers", default=False,
+                                           description=SHARE_LAYER_EXPORT_DESC)
+
+    use_export_profiler = BoolProperty(name="Profile Export", default=False,
+                                       description=EXPORT_PROFILER_DESC)
+    profile_top_count = IntProperty(name="Slowest Objects", default=10, min=1, max=MAX_PROFILE_OBJECTS,
+                                    description="How many of the slowest objects to show")
+    # Results of the last profiled export
+    profile_total = FloatProperty()
+    profile_phases = CollectionProperty(type=LuxCoreProfileEntry)
+    profile_objects = CollectionProperty(type=LuxCoreProfileEntry)
+    profile_report = StringProperty()
+
+    def store_profile(self, profiler):
+        try:
+            self.profile_phases.clear()
+            self.profile_objects.clear()
+        except AttributeError:
+            print("Can't store export profile in _RestrictContext")
+            return
+
+        self["profile_total"] = profiler.total
+        self._add_entries(self.profile_phases, profiler.sorted_phases())
+        self._add_entries(self.profile_objects, profiler.slowest_objects(MAX_PROFILE_OBJECTS))
+        self["profile_report"] = profiler.to_json()
+
+    def _add_entries(self, collection, entries):
+        for name, seconds, calls in entries:
+            new = collection.add()
+            new["name"] = name
+            new["seconds"] = seconds
+            new["calls"] = calls
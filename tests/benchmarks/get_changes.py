@@ -0,0 +1,57 @@
+"""
+Measures the per-redraw overhead of Exporter.get_changes() in viewport render when nothing changed,
+with the fingerprint fast path and with the full conversion of config, camera and imagepipeline.
+
+Needs the UI (a 3D view of the default startup file), so don't use -b. Run it with:
+blender --addons BlendLuxCore --factory-startup -noaudio --python get_changes.py
+"""
+
+from time import time
+from types import SimpleNamespace
+import bpy
+
+from BlendLuxCore import export
+
+REDRAWS = 200
+
+
+def viewport_context():
+    """ The view_draw() context, built from the 3D view of the startup file """
+    area = next(area for area in bpy.context.screen.areas if area.type == "VIEW_3D")
+    region = next(region for region in area.regions if region.type == "WINDOW")
+    space = area.spaces.active
+    scene = bpy.context.scene
+    return SimpleNamespace(scene=scene, region=region, space_data=space, region_data=space.region_3d,
+                           visible_objects=[obj for obj in scene.objects if obj.is_visible(scene)])
+
+
+def bench(exporter, context, force_full):
+    start = time()
+    for i in range(REDRAWS):
+        if force_full:
+            # Invalidate the fingerprint, like before the fast path existed
+            exporter.fingerprint_cache.fingerprint = None
+        exporter.get_changes(context.scene, context)
+    return (time() - start) / REDRAWS * 1000
+
+
+def main():
+    scene = bpy.context.scene
+    scene.render.engine = "LUXCORE"
+    context = viewport_context()
+
+    exporter = export.Exporter()
+    # Initialize all caches
+    exporter.get_changes(scene, context)
+
+    full = bench(exporter, context, force_full=True)
+    fast = bench(exporter, context, force_full=False)
+
+    print("Per redraw without changes:")
+    print("Full conversion:  %8.3f ms" % full)
+    print("Fingerprint:      %8.3f ms" % fast)
+
+    bpy.ops.wm.quit_blender()
+
+
+main()
@@ -0,0 +1,97 @@
+"""
+Benchmark of the viewport change detection in caches.ObjectCache:
+the old full scan over scene.objects compared to the update index fed by the scene_update_post handler.
+
+Creates a synthetic scene (no .blend file needed), this takes a while for 100k objects. Run it with:
+blender --addons BlendLuxCore --factory-startup -noaudio -b --python object_cache.py
+"""
+
+from time import time
+import bpy
+
+from BlendLuxCore.export import caches
+
+OBJECT_COUNT = 100000
+REDRAWS = 100
+
+
+def full_scan_diff(scene):
+    """ The old ObjectCache.diff(), visits every object in the scene """
+    changed = []
+
+    if bpy.data.objects.is_updated:
+        for obj in scene.objects:
+            if obj.is_updated_data or obj.is_updated:
+                changed.append(obj)
+
+    return changed
+
+
+def create_scene():
+    scene = bpy.data.scenes.new("object_cache_benchmark")
+    mesh = bpy.data.meshes.new("shared_mesh")
+    mesh.from_pydata([(0, 0, 0), (1, 0, 0), (0, 1, 0)], [], [(0, 1, 2)])
+
+    start = time()
+    for i in range(OBJECT_COUNT):
+        obj = bpy.data.objects.new("obj%d" % i, mesh)
+        obj.location = (i % 1000, i // 1000, 0)
+        scene.objects.link(obj)
+    scene.update()
+    print("Created %d objects in %.1fs" % (OBJECT_COUNT, time() - start))
+    return scene
+
+
+def main():
+    scene = create_scene()
+    cache = caches.ObjectCache()
+    cache.listen()
+    timings = {"full scan": 0, "index collect": 0}
+
+    # Measure inside the handler, the update flags are only valid there
+    def handler(updated_scene):
+        start = time()
+        full_scan_diff(updated_scene)
+        timings["full scan"] += time() - start
+
+        start = time()
+        caches.ObjectCache.collect_updates(caches.find_updated_objects(updated_scene))
+        timings["index collect"] += time() - start
+
+    bpy.app.handlers.scene_update_post.append(handler)
+
+    # One object moves, the viewport redraws
+    index_diff = 0
+    for i in range(REDRAWS):
+        obj = scene.objects[i]
+        obj.location.z += 1
+        scene.update()
+
+        start = time()
+        changed = cache.diff(scene)
+        index_diff += time() - start
+        assert changed, "Moved object was not detected"
+
+    bpy.app.handlers.scene_update_post.remove(handler)
+
+    # Redraws without any change (the common case during viewport rendering)
+    start = time()
+    for i in range(REDRAWS):
+        full_scan_diff(scene)
+    idle_full_scan = time() - start
+
+    start = time()
+    for i in range(REDRAWS):
+        cache.diff(scene)
+    idle_index = time() - start
+
+    to_ms = 1000 / REDRAWS
+    print("Objects: %d, per redraw:" % OBJECT_COUNT)
+    print("One object moved, full scan:    %8.3f ms" % (timings["full scan"] * to_ms))
+    print("One object moved, index:        %8.3f ms (collect %.3f ms + diff %.3f ms)"
+          % ((timings["index collect"] + index_diff) * to_ms, timings["index collect"] * to_ms, index_diff * to_ms))
+    print("No changes, full scan:          %8.3f ms" % (idle_full_scan * to_ms))
+    print("No changes, index:              %8.3f ms" % (idle_index * to_ms))
+
+
+main()
@@ -0,0 +1,126 @@
+"""
+Micro-benchmark comparing utils.create_props_unbatched() (one pyluxcore.Property per key)
+with the batched utils.PropsBatch/utils.create_props() path.
+
+Does not need a .blend file, the definitions are synthetic. Run it with:
+blender --addons BlendLuxCore --factory-startup -noaudio -b --python props_batch.py
+"""
+
+from time import time
+import random
+
+from BlendLuxCore import utils
+from BlendLuxCore.bin import pyluxcore
+
+OBJECT_COUNT = 20000
+LIGHT_COUNT = 5000
+TEXTURE_COUNT = 1000
+
+
+def matrix():
+    return [random.random() for _ in range(16)]
+
+
+def synthetic_scene():
+    """ Returns a list of (prefix, definitions) similar to what the exporters create """
+    blocks = []
+
+    for i in range(OBJECT_COUNT):
+        prefix = "scene.objects.obj%d." % i
+        blocks.append((prefix, {
+            "material": "mat%d" % (i % 100),
+            "shape": "Mesh-obj%d" % i,
+            "transformation": matrix(),
+            "camerainvisible": False,
+        }))
+
+    for i in range(LIGHT_COUNT):
+        prefix = "scene.lights.light%d." % i
+        blocks.append((prefix, {
+            "type": "spot",
+            "gain": [1.0, 0.9, 0.8],
+            "samples": -1,
+            "importance": 1.0,
+            "efficency": 17.0,
+            "power": 100.0,
+            "coneangle": 30.0,
+            "conedeltaangle": 5.0,
+            "position": [0, 0, 0],
+            "target": [0, 0, -1],
+            "transformation": matrix(),
+            "visibility.indirect.diffuse.enable": True,
+            "visibility.indirect.glossy.enable": True,
+            "visibility.indirect.specular.enable": True,
+            "visibilitymap.enable": True,
+        }))
+
+    for i in range(TEXTURE_COUNT):
+        prefix = "scene.textures.tex%d." % i
+        blocks.append((prefix, {
+            "type": "imagemap",
+            # Backslashes and empty strings can't be written in the SetFromString() syntax
+            "file": "C:\\Users\\artist\\textures\\wood%d.png" % i,
+            "channel": "",
+            "gamma": 2.2,
+        }))
+
+    return blocks
+
+
+def bench(name, func, blocks):
+    start = time()
+    props = func(blocks)
+    elapsed = time() - start
+    print("%-40s %6.3fs (%d keys)" % (name, elapsed, len(props.GetAllNames())))
+    return props
+
+
+def per_key(blocks):
+    props = pyluxcore.Properties()
+    for prefix, definitions in blocks:
+        props.Set(utils.create_props_unbatched(prefix, definitions))
+    return props
+
+
+def per_block(blocks):
+    props = pyluxcore.Properties()
+    for prefix, definitions in blocks:
+        props.Set(utils.create_props(prefix, definitions))
+    return props
+
+
+def single_batch(blocks):
+    batch = utils.PropsBatch()
+    for prefix, definitions in blocks:
+        batch.add(prefix, definitions)
+    return batch.to_props()
+
+
+random.seed(0)
+blocks = synthetic_scene()
+print("%d objects, %d lights, %d textures" % (OBJECT_COUNT, LIGHT_COUNT, TEXTURE_COUNT))
+
+reference = bench("Property per key (old)", per_key, blocks)
+bench("create_props() per block", per_block, blocks)
+batched = bench("one PropsBatch for everything", single_batch, blocks)
+
+# Sanity check: both paths have to define the same values
+# (the batched path stores the values as strings, so we compare the converted values)
+STRING_KEYS = {"material", "shape", "type", "file", "channel"}
+
+# Strings that SetFromString() would change must use the per-key path
+assert utils._to_prop_string("C:\\textures\\wood.png") is None
+assert utils._to_prop_string("") is None
+assert batched.Get("scene.textures.tex0.file").GetString() == "C:\\Users\\artist\\textures\\wood0.png"
+assert batched.Get("scene.textures.tex0.channel").GetString() == ""
+
+for key in reference.GetAllNames():
+    old_prop = reference.Get(key)
+    new_prop = batched.Get(key)
+
+    if key.rsplit(".", 1)[1] in STRING_KEYS:
+        assert old_prop.GetString() == new_prop.GetString(), key
+    else:
+        assert old_prop.GetFloats() == new_prop.GetFloats(), key
+
+print("Results are identical")
@@ -0,0 +1,99 @@
+import unittest
+import sys
+import ctypes
+
+import numpy
+
+import BlendLuxCore
+from BlendLuxCore.bin import pyluxcore
+from BlendLuxCore.draw import AOV, AOVS, DEFAULT_AOV_SETTINGS, passes
+
+# More rows than passes.PAD_CHUNK_ROWS, so the padding needs several chunks
+WIDTH = 37
+HEIGHT = passes.PAD_CHUNK_ROWS * 2 + 5
+
+
+class FakePass:
+    """ Blender render pass whose pixels are a numpy array """
+    def __init__(self, name, channels, width=WIDTH, height=HEIGHT):
+        self.name = name
+        self.channels = channels
+        self.pixels = numpy.zeros(WIDTH * HEIGHT * channels, dtype=numpy.float32)
+        self._struct = passes._RenderPass(channels=channels, name=name.encode(), rect=self.pixels.ctypes.data,
+                                          rectx=width, recty=height)
+
+    def as_pointer(self):
+        return ctypes.addressof(self._struct)
+
+
+class FakeFilm:
+    """ Returns the same output for every output type """
+    def __init__(self, output):
+        self.output = output
+
+    def GetOutputFloat(self, output_type, buffer):
+        numpy.ctypeslib.as_array(buffer)[:] = self.output
+
+    def GetOutputUInt(self, output_type, buffer):
+        numpy.ctypeslib.as_array(buffer)[:] = self.output
+
+
+def film_output(aov):
+    size = WIDTH * HEIGHT * aov.channel_count
+    random = numpy.random.RandomState(size)
+
+    if aov.array_type == "I":
+        return random.randint(0, 1000, size).astype(numpy.uint32)
+    else:
+        return (random.random_sample(size) * 10).astype(numpy.float32)
+
+
+class TestWriteOutput(unittest.TestCase):
+    def assert_same_as_convert_func(self, aov, pass_channels):
+        output = film_output(aov)
+
+        expected = FakePass("Expected", pass_channels)
+        aov.convert_func(WIDTH, HEIGHT, output.copy(), expected.as_pointer(), aov.normalize)
+
+        actual = FakePass("Actual", pass_channels)
+        target = passes.PassTarget(actual)
+        self.assertTrue(passes.write_output(FakeFilm(output), None, aov, target, WIDTH, HEIGHT))
+
+        numpy.testing.assert_allclose(actual.pixels, expected.pixels, rtol=1e-6)
+
+    def test_float(self):
+        self.assert_same_as_convert_func(AOVS["ALPHA"], 1)
+        self.assert_same_as_convert_func(DEFAULT_AOV_SETTINGS, 3)
+        self.assert_same_as_convert_func(AOVS["RGBA"], 4)
+
+    def test_uint(self):
+        self.assert_same_as_convert_func(AOVS["MATERIAL_ID"], 1)
+
+    def test_normalize(self):
+        self.assert_same_as_convert_func(AOVS["RAYCOUNT"], 1)
+        # uint output that is normalized after the conversion to float
+        self.assert_same_as_convert_func(AOVS["SAMPLECOUNT"], 1)
+
+    def test_pad_2_to_3(self):
+        self.assert_same_as_convert_func(AOVS["UV"], 3)
+
+    def test_pad_3_to_4(self):
+        # Like the Combined pass of an opaque film
+        combined = AOV(3, "f", pyluxcore.ConvertFilmChannelOutput_3xFloat_To_4xFloatList, False, 1)
+        self.assert_same_as_convert_func(combined, 4)
+
+    def test_layout_mismatch(self):
+        # The pass memory is only written if the struct matches what Blender told us about the pass
+        aov = DEFAULT_AOV_SETTINGS
+        film = FakeFilm(film_output(aov))
+        fake_pass = FakePass("Pass", 3, width=WIDTH + 1)
+
+        self.assertFalse(passes.write_output(film, None, aov, passes.PassTarget(fake_pass), WIDTH, HEIGHT))
+        self.assertFalse(fake_pass.pixels.any())
+
+
+# we have to manually invoke the test runner here, as we cannot use the CLI
+suite = unittest.defaultTestLoader.loadTestsFromTestCase(TestWriteOutput)
+result = unittest.TextTestRunner().run(suite)
+
+sys.exit(not result.wasSuccessful())
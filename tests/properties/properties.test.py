@@ -0,0 +1,77 @@
+import unittest
+import sys
+
+import BlendLuxCore
+from BlendLuxCore import utils
+
+# Strings that can not be written in the SetFromString() syntax
+UNQUOTABLE_STRINGS = ["", 'say "hi"', "C:\\textures\\wood.png", "line\nbreak", "carriage\rreturn"]
+
+
+class TestPropsBatch(unittest.TestCase):
+    def assert_same_props(self, definitions):
+        batched = utils.create_props("test.", definitions)
+        unbatched = utils.create_props_unbatched("test.", definitions)
+
+        self.assertEqual(sorted(batched.GetAllNames()), sorted(unbatched.GetAllNames()))
+        for name in unbatched.GetAllNames():
+            self.assertEqual(batched.Get(name).Get(), unbatched.Get(name).Get(), name)
+
+    def test_bools(self):
+        self.assert_same_props({"true": True, "false": False})
+
+        props = utils.create_props("test.", {"true": True, "false": False})
+        self.assertTrue(props.Get("test.true").GetBool())
+        self.assertFalse(props.Get("test.false").GetBool())
+
+    def test_numbers(self):
+        self.assert_same_props({
+            "int": 42,
+            "negative": -7,
+            "float": 0.1,
+            "small": 1e-12,
+            "large": 123456789.125,
+        })
+
+    def test_lists(self):
+        self.assert_same_props({
+            "floats": [0.1, 0.2, 0.3],
+            "matrix": [float(i) / 3 for i in range(16)],
+            "ints": [1, 2, 3],
+            "mixed": [1, 0.5, True],
+            "strings": ["a", "b"],
+        })
+
+    def test_strings(self):
+        self.assert_same_props({"simple": "matte", "spaces": "a name with spaces"})
+
+        for i, value in enumerate(UNQUOTABLE_STRINGS):
+            self.assert_same_props({"string%d" % i: value})
+
+            props = utils.create_props("test.", {"value": value})
+            self.assertEqual(props.Get("test.value").GetString(), value)
+
+    def test_unquotable_strings_are_unbatched(self):
+        definitions = {"string%d" % i: value for i, value in enumerate(UNQUOTABLE_STRINGS)}
+        definitions["simple"] = "matte"
+        text, unbatched = utils.definitions_to_text(definitions)
+
+        self.assertEqual(text, 'simple = "matte"')
+        self.assertEqual(sorted(unbatched), sorted((key, value) for key, value in definitions.items()
+                                                    if key != "simple"))
+
+    def test_later_definitions_replace_earlier_ones(self):
+        batch = utils.PropsBatch()
+        batch.add("test.", {"value": 1, "name": "first"})
+        batch.add("test.", {"value": 2, "name": "C:\\second"})
+        props = batch.to_props()
+
+        self.assertEqual(props.Get("test.value").GetInt(), 2)
+        self.assertEqual(props.Get("test.name").GetString(), "C:\\second")
+
+
+# we have to manually invoke the test runner here, as we cannot use the CLI
+suite = unittest.defaultTestLoader.loadTestsFromTestCase(TestPropsBatch)
+result = unittest.TextTestRunner().run(suite)
+
+sys.exit(not result.wasSuccessful())
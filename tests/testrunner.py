@@ -19,21 +19,25 @@ if not os.path.exists(blender_executable):
     print("Could not find Blender executable at path:", blender_executable)
     exit(1)
 
-# iterate over each *.test.blend file in the "tests" directory
-# and open up blender with the .test.blend file and the corresponding .test.py python script
+# iterate over each *.test.py file in the "tests" directory
+# and open up blender with the corresponding .test.blend file (if there is one) and the python script
 status = 0
 failed = []
 
-for blend_file in glob.glob("./**/*.test.blend"):
-    test_name = os.path.splitext(os.path.basename(blend_file))[0]
+for script in glob.glob("./**/*.test.py"):
+    test_name = os.path.splitext(os.path.basename(script))[0]
+    blend_file = script.replace(".py", ".blend")
 
     print("\n\n")
     print("=" * 40)
     print(test_name)
     print("=" * 40)
 
-    args = [blender_executable, "--addons", "BlendLuxCore", "--factory-startup", "-noaudio",
-            "-b", blend_file, "--python", blend_file.replace(".blend", ".py")]
+    args = [blender_executable, "--addons", "BlendLuxCore", "--factory-startup", "-noaudio", "-b"]
+    if os.path.exists(blend_file):
+        args.append(blend_file)
+    # Tests without .blend file run in the default scene
+    args += ["--python", script]
     return_code = subprocess.call(args)
 
     if return_code != 0:
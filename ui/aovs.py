@@ -52,3 +52,7 @@ class LUXCORE_RENDERLAYER_PT_aovs(RenderLayerButtonsPanel, Panel):
         col.prop(aovs, "samplecount")
         col.prop(aovs, "convergence")
         col.prop(aovs, "irradiance")
+
+        if not context.scene.luxcore.display.refresh_all_aovs:
+            layout.label("Shown During Render (others are empty until the end):")
+            layout.prop(aovs, "pinned")
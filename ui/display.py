@@ -17,6 +17,22 @@ class LUXCORE_RENDER_PT_display_settings(RenderButtonsPanel, Panel):
 
         layout.label("Viewport Render:")
         layout.prop(display, "viewport_halt_time")
+        layout.prop(display, "viewport_precision")
+        layout.prop(display, "use_frame_fetcher")
+        layout.prop(display, "use_edit_coalescing")
+        layout.prop(display, "show_hud")
+        row = layout.row()
+        row.prop(display, "use_adaptive_resolution")
+        sub = row.row()
+        sub.active = display.use_adaptive_resolution
+        sub.prop(display, "adaptive_target_fps")
 
         layout.label("Final Render:")
         layout.prop(display, "interval")
+        row = layout.row()
+        row.prop(display, "use_adaptive_refresh")
+        sub = row.row()
+        sub.active = display.use_adaptive_refresh
+        sub.prop(display, "refresh_overhead")
+        layout.prop(display, "refresh_all_aovs")
+        layout.prop(display, "use_film_refresh_worker")
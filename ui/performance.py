@@ -0,0 +1,61 @@
+from bl_ui.properties_render import RenderButtonsPanel
+from bpy.types import Panel
+
+
+class LUXCORE_RENDER_PT_performance(RenderButtonsPanel, Panel):
+    COMPAT_ENGINES = {"LUXCORE"}
+    bl_label = "LuxCore Performance"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene.render.engine == "LUXCORE"
+
+    def draw(self, context):
+        layout = self.layout
+        performance = context.scene.luxcore.performance
+
+        layout.label("Final Render:")
+        row = layout.row(align=True)
+        row.prop(performance, "use_geometry_cache")
+        row.operator("luxcore.clear_geometry_cache", text="", icon="X")
+        col = layout.column()
+        col.active = performance.use_geometry_cache
+        col.prop(performance, "geometry_cache_path")
+        col.prop(performance, "geometry_cache_size")
+        layout.prop(performance, "use_shared_layer_export")
+
+        layout.label("Animation:")
+        # Blender only keeps the render engine between frames if persistent data is enabled
+        layout.prop(context.scene.render, "use_persistent_data", text="Keep Scene Between Frames")
+
+        layout.separator()
+        layout.prop(performance, "use_export_profiler")
+
+        if performance.use_export_profiler and performance.profile_phases:
+            self._draw_profile(layout, performance)
+
+    def _draw_profile(self, layout, performance):
+        row = layout.row()
+        row.label("Last Export: %.2fs" % performance.profile_total)
+        row.operator("luxcore.copy_export_report", icon="COPYDOWN")
+
+        self._draw_entries(layout, "Phases:", performance.profile_phases)
+
+        layout.prop(performance, "profile_top_count")
+        top_objects = performance.profile_objects[:performance.profile_top_count]
+        self._draw_entries(layout, "Slowest Objects:", top_objects)
+
+    def _draw_entries(self, layout, label, entries):
+        col = layout.column(align=True)
+        box = col.box()
+        box.label(text=label)
+
+        box = col.box()
+        for entry in entries:
+            row = box.row()
+            split = row.split(percentage=0.6)
+            split.label(entry.name)
+            split = split.split(percentage=0.6)
+            split.label("%.3fs" % entry.seconds)
+            split.label("%dx" % entry.calls)
@@ -7,12 +7,18 @@ from ..bin import pyluxcore
 
 
 class ExportedObject(object):
-    def __init__(self, mesh_definitions):
+    def __init__(self, mesh_definitions, shape_names=None):
         # Note that luxcore_names is a list of names (because an object in Blender can have multiple materials,
         # while in LuxCore it can have only one material, so we have to split it into multiple LuxCore objects)
         self.luxcore_names = [lux_obj_name for lux_obj_name, material_index in mesh_definitions]
         # list of lists of the form [lux_obj_name, material_index]
         self.mesh_definitions = mesh_definitions
+        # The shapes used by the LuxCore objects. Usually each object has its own shape,
+        # but objects that share a mesh (see get_shared_mesh_key()) use the shapes of the first one
+        if shape_names is None:
+            # The "Mesh-" prefix is hardcoded in Scene_DefineBlenderMesh1 in the LuxCore API
+            shape_names = ["Mesh-" + lux_obj_name for lux_obj_name in self.luxcore_names]
+        self.shape_names = shape_names
 
 
 class ExportedLight(object):
@@ -93,6 +99,24 @@ def create_props(prefix, definitions):
     :param definitions: dictionary of definition pairs. Example: {"fieldofview", 45}
     :return: pyluxcore.Properties() object, initialized with the given definitions.
     """
+    batch = PropsBatch()
+    batch.add(prefix, definitions)
+    return batch.to_props()
+
+
+def add_prefix(prefix, definitions):
+    """
+    Returns a new dictionary with the prefix prepended to each key of the definitions.
+    Used where definitions are compared before they are converted with create_props().
+    """
+    return {prefix + key: value for key, value in definitions.items()}
+
+
+def create_props_unbatched(prefix, definitions):
+    """
+    Same as create_props(), but creates one pyluxcore.Property per key.
+    Only kept for comparison (see tests/benchmarks/props_batch.py), use create_props().
+    """
     props = pyluxcore.Properties()
 
     for k, v in definitions.items():
@@ -101,6 +125,104 @@ def create_props(prefix, definitions):
     return props
 
 
+class PropsBatch(object):
+    """
+    Collects definitions as plain Python data and converts them to pyluxcore.Properties
+    with a single SetFromString() call, instead of creating one pyluxcore.Property and
+    calling Set() for each key (every call into pyluxcore has a significant overhead).
+    Values that can not be expressed in the text format (e.g. blobs) are set one by one.
+    """
+    def __init__(self):
+        # {key: value}, later definitions of a key replace earlier ones (like in pyluxcore.Properties)
+        self.definitions = {}
+
+    def __len__(self):
+        return len(self.definitions)
+
+    def add(self, prefix, definitions):
+        for k, v in definitions.items():
+            self.definitions[prefix + k] = v
+
+    def set(self, key, value):
+        self.definitions[key] = value
+
+    def to_props(self):
+        text, unbatched = definitions_to_text(self.definitions)
+        return props_from_text(text, unbatched)
+
+
+def definitions_to_text(definitions):
+    """
+    Returns the text for SetFromString() and a list of the (key, value) pairs that have to be set one by one.
+    Only uses plain Python, so it can also run in a worker process.
+    """
+    lines = []
+    unbatched = []
+
+    for key, value in definitions.items():
+        value_str = _to_prop_string(value)
+
+        if value_str is None or "=" in key or " " in key:
+            unbatched.append((key, value))
+        else:
+            lines.append(key + " = " + value_str)
+
+    return "\n".join(lines), unbatched
+
+
+def props_from_text(text, unbatched):
+    """ Counterpart of definitions_to_text() """
+    props = pyluxcore.Properties()
+
+    if text:
+        props.SetFromString(text)
+
+    for key, value in unbatched:
+        props.Set(pyluxcore.Property(key, value))
+
+    return props
+
+
+def _to_prop_string(value):
+    """
+    Format a value in the syntax of LuxCore .cfg/.scn files.
+    Returns None if the value can not be represented in this syntax.
+    """
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return None
+
+        parts = []
+        for elem in value:
+            # Nested sequences (e.g. blobs in a list) are not supported
+            if isinstance(elem, (list, tuple)):
+                return None
+            elem_str = _to_prop_string(elem)
+            if elem_str is None:
+                return None
+            parts.append(elem_str)
+        return " ".join(parts)
+
+    # Note: bool has to be checked before int because it is a subclass of int
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        # repr() is exact, but inf and nan might not be understood by LuxCore
+        return repr(value) if math.isfinite(value) else None
+    if isinstance(value, str):
+        # Strings are enclosed in quotes, there is no way to escape quotes or line breaks.
+        # SetFromString() treats backslashes (e.g. in Windows paths) as escape characters
+        # and drops empty values, these have to use the per-key path as well.
+        if not value or '"' in value or "\\" in value or "\n" in value or "\r" in value:
+            return None
+        return '"' + value + '"'
+
+    # E.g. bytes or mathutils types
+    return None
+
+
 def get_worldscale(scene, as_scalematrix=True):
     unit_settings = scene.unit_settings
 
@@ -174,7 +296,8 @@ def calc_filmsize_raw(scene, context=None):
     return width, height
 
 
-def calc_filmsize(scene, context=None):
+def calc_filmsize(scene, context=None, scale=1):
+    """ scale is used to render the viewport at reduced resolution (see engine.viewport.AdaptiveResolution) """
     border_min_x, border_max_x, border_min_y, border_max_y = calc_blender_border(scene, context)
     width_raw, height_raw = calc_filmsize_raw(scene, context)
     
@@ -199,6 +322,10 @@ def calc_filmsize(scene, context=None):
         width = int(width_raw * border_max_x) - int(width_raw * border_min_x)
         height = int(height_raw * border_max_y) - int(height_raw * border_min_y)
 
+    if scale != 1:
+        width = int(width * scale)
+        height = int(height * scale)
+
     # Make sure width and height are never zero
     # (can e.g. happen if you have a small border in camera viewport and zoom out a lot)
     width = max(2, width)
@@ -419,7 +546,8 @@ def use_obj_motion_blur(obj, scene):
     return object_blur and obj.luxcore.enable_motion_blur
 
 
-def use_instancing(obj, scene, context):
+def use_instancing(obj, scene, context, shared_mesh_key=None):
+    """ shared_mesh_key: the result of get_shared_mesh_key() if the caller already computed it """
     if context:
         # Always instance in viewport so we can move the object/light around
         return True
@@ -428,11 +556,70 @@ def use_instancing(obj, scene, context):
         # When using object motion blur, we export all objects as instances
         return True
 
-    # TODO: more checks, e.g. Alt+D copies without modifiers or with equal modifier stacks
+    if scene.render.use_persistent_data:
+        # The luxcore scene is kept between animation frames, objects are moved by updating their transformation
+        return True
+
+    if shared_mesh_key is not None:
+        # Alt+D copies without modifiers or with equal modifier stacks, the mesh is only exported once
+        return True
 
     return False
 
 
+def get_shared_mesh_key(obj):
+    """
+    Objects with the same key are guaranteed to produce the same mesh in final render,
+    so the mesh can be exported once and shared by all of them.
+    Returns None if the object can not share its mesh.
+    """
+    if obj.type != "MESH" or obj.data is None or obj.data.users < 2:
+        return None
+
+    modifier_key = []
+
+    for mod in obj.modifiers:
+        if not mod.show_render:
+            continue
+
+        if mod.type in {"PARTICLE_SYSTEM", "UV_PROJECT"}:
+            # Particle systems may hide the emitter or explode it, UV projectors are a collection of objects
+            return None
+
+        if getattr(mod, "texture_coords", None) == "GLOBAL":
+            # Displace/wave modifiers with global texture coordinates depend on the object location
+            return None
+
+        settings = [mod.type]
+
+        for prop in mod.bl_rna.properties:
+            if prop.identifier in {"rna_type", "name", "show_viewport", "show_in_editmode",
+                                   "show_on_cage", "show_expanded"}:
+                continue
+
+            value = getattr(mod, prop.identifier, None)
+
+            if isinstance(value, bpy.types.Object):
+                # The result depends on the transformation of the object relative to the referenced object
+                return None
+            elif isinstance(value, bpy.types.ID):
+                settings.append(make_key(value))
+            elif isinstance(value, (bpy.types.bpy_struct, bpy.types.bpy_prop_collection)):
+                # Simulation settings (cloth, soft body etc.), the result is different for each object
+                return None
+            elif hasattr(value, "__len__") and not isinstance(value, str):
+                settings.append(tuple(value))
+            else:
+                settings.append(value)
+
+        modifier_key.append(tuple(settings))
+
+    # Modifiers reference vertex groups by name, but the weights in the mesh are stored by group index,
+    # so the same name can select different vertices in objects with a different group order
+    vertex_groups = tuple(group.name for group in obj.vertex_groups)
+    return make_key(obj.data), vertex_groups, tuple(modifier_key)
+
+
 def find_smoke_domain_modifier(obj):
     for mod in obj.modifiers:
         if mod.name == "Smoke" and mod.smoke_type == "DOMAIN":
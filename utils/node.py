@@ -42,6 +42,34 @@ def find_nodes(node_tree, bl_idname):
     return [node for node in node_tree.nodes if node.bl_idname == bl_idname]
 
 
+def is_animated(node_tree, _visited=None):
+    """
+    Check if the node tree can look different in each frame: it or one of the node trees
+    it uses through pointer nodes has animation data, or it uses an image sequence or movie
+    """
+    if _visited is None:
+        _visited = set()
+
+    # Pointer nodes can reference each other in a loop
+    if node_tree.as_pointer() in _visited:
+        return False
+    _visited.add(node_tree.as_pointer())
+
+    if node_tree.animation_data:
+        return True
+
+    for node in node_tree.nodes:
+        image = getattr(node, "image", None)
+        if image and image.source in {"SEQUENCE", "MOVIE"}:
+            return True
+
+        pointed_tree = getattr(node, "node_tree", None)
+        if pointed_tree and is_animated(pointed_tree, _visited):
+            return True
+
+    return False
+
+
 def update_opengl_materials(_, context):
     if not hasattr(context, "object") or not context.object or not context.object.active_material:
         return
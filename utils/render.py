@@ -1,4 +1,3 @@
-from . import calc_filmsize
 from .. import utils
 
 engine_to_str = {
@@ -12,6 +11,11 @@ engine_to_str = {
     "RTPATHCPU": "RT Path CPU",
 }
 
+# Share of the render time that is used as film refresh interval, see film_refresh_interval()
+REFRESH_BACKOFF = 0.1
+# Film refreshes are never scheduled closer together than this, in seconds
+MIN_REFRESH_INTERVAL = 0.5
+
 sampler_to_str = {
     "RANDOM": "Random",
     "SOBOL": "Sobol",
@@ -21,8 +25,16 @@ sampler_to_str = {
 }
 
 
-def refresh(engine, scene, config, draw_film, time_until_film_refresh=0):
-    """ Stats and optional film refresh during final render """
+def refresh(engine, scene, config, draw_film, time_until_film_refresh=0, import_all_aovs=False):
+    """
+    Stats and optional film refresh during final render.
+    Unless import_all_aovs is True, the film refresh follows the AOV refresh policy in the display settings.
+    """
+    worker = engine.film_refresh_worker
+    if worker:
+        # Show the result of the last background refresh
+        worker.finish(engine)
+
     error_message = ""
     try:
         engine.session.UpdateStats()
@@ -47,7 +59,12 @@ def refresh(engine, scene, config, draw_film, time_until_film_refresh=0):
 
     if draw_film:
         # Show updated film (this operation is expensive)
-        engine.framebuffer.draw(engine, engine.session, scene)
+        import_all_aovs |= scene.luxcore.display.refresh_all_aovs
+        if worker:
+            # The result is handed to Blender in one of the next refresh() calls
+            worker.start(engine, scene, import_all_aovs)
+        else:
+            engine.framebuffer.draw(engine, engine.session, scene, import_all_aovs)
 
     # Update progress bar if we have halt conditions
     halt = utils.get_halt_conditions(scene)
@@ -144,12 +161,29 @@ def get_pretty_stats(config, stats, scene):
     return " | ".join(pretty)
 
 
-def shortest_display_interval(scene):
-    # Magic formula to compute shortest possible display interval (found through testing).
-    # If the interval is any shorter, the CPU won't be able to keep up.
-    # Only used for final renders.
-    width, height = calc_filmsize(scene)
-    return (width * height) / 852272.0 * 1.1
+def film_refresh_interval(scene, framebuffer, rendered_time):
+    """
+    Seconds between film refreshes in final render.
+    The adaptive interval grows with the render time, because the noise falls with the square root
+    of the samples, so later refreshes show less change. It is limited by the user interval,
+    unless the measured refresh cost would exceed the allowed overhead.
+    """
+    display = scene.luxcore.display
+    if not display.use_adaptive_refresh:
+        return display.interval
+
+    interval = min(rendered_time * REFRESH_BACKOFF, display.interval)
+    return max(interval, shortest_refresh_interval(scene, framebuffer, display.refresh_overhead / 100))
+
+
+def shortest_refresh_interval(scene, framebuffer, max_overhead):
+    """
+    Shortest interval that keeps the measured refresh cost below max_overhead (a share of the time).
+    As long as no refresh was measured, the user interval is used.
+    """
+    if framebuffer.last_refresh_cost is None:
+        return scene.luxcore.display.interval
+    return max(MIN_REFRESH_INTERVAL, framebuffer.last_refresh_cost / max_overhead)
 
 
 def find_suggested_clamp_value(session, scene=None):